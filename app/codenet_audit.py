@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+🧾 CodeNet Audit - Log binário de eventos de apps (append-only)
+Registros de tamanho fixo em segmentos com índice esparso por tempo; consultas por app e intervalo
+"""
+
+import os
+import time
+import queue
+import struct
+import bisect
+import logging
+import threading
+from array import array
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+logger = logging.getLogger("codenet_audit")
+
+# Código do evento = posição + 1 (0 é reservado); só acrescentar no fim
+EVENT_TYPES = ("registered", "connected", "disconnected", "expired", "revoked", "rotated", "stale", "offline",
+               "archived", "rehydrated")
+EVENT_CODES = {name: code for code, name in enumerate(EVENT_TYPES, 1)}
+
+SEGMENT_MAGIC = b"CNAUDIT1"
+# timestamp (epoch, float64) | código do evento (uint8) | app_id (ASCII, completado com zeros)
+RECORD = struct.Struct("<dB31s")
+# timestamp do registro | número do registro no segmento
+INDEX_ENTRY = struct.Struct("<dQ")
+
+
+class AuditSegment:
+    """Um arquivo de registros e seu índice esparso (.idx, também append-only)"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path[:-len(".log")] + ".idx"
+        self.index_times = array("d")
+        self.index_records = array("Q")
+        self.count = 0
+        self.last_time = None
+    
+    @property
+    def first_time(self):
+        return self.index_times[0] if self.index_times else None
+    
+    def size(self):
+        return len(SEGMENT_MAGIC) + self.count * RECORD.size
+    
+    def load(self, index_interval):
+        """Abre um segmento existente; descarta registro parcial e reconstrói o índice se preciso"""
+        data_size = os.path.getsize(self.path) - len(SEGMENT_MAGIC)
+        self.count = max(data_size, 0) // RECORD.size
+        if data_size % RECORD.size:
+            # Gravação interrompida no meio de um registro
+            with open(self.path, "r+b") as f:
+                f.truncate(self.size())
+        
+        entries = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                raw = f.read()
+            entries = len(raw) // INDEX_ENTRY.size
+            for time_value, record in INDEX_ENTRY.iter_unpack(raw[:entries * INDEX_ENTRY.size]):
+                if record >= self.count:
+                    break
+                self.index_times.append(time_value)
+                self.index_records.append(record)
+        
+        expected = (self.count + index_interval - 1) // index_interval
+        if len(self.index_times) != expected or entries != expected:
+            self._rebuild_index(index_interval)
+        
+        if self.count:
+            with open(self.path, "rb") as f:
+                f.seek(self.size() - RECORD.size)
+                self.last_time = RECORD.unpack(f.read(RECORD.size))[0]
+    
+    def _rebuild_index(self, index_interval):
+        self.index_times = array("d")
+        self.index_records = array("Q")
+        with open(self.path, "rb") as f, open(self.index_path, "wb") as index_file:
+            for record in range(0, self.count, index_interval):
+                f.seek(len(SEGMENT_MAGIC) + record * RECORD.size)
+                time_value = RECORD.unpack(f.read(RECORD.size))[0]
+                self.index_times.append(time_value)
+                self.index_records.append(record)
+                index_file.write(INDEX_ENTRY.pack(time_value, record))
+    
+    def start_record(self, start):
+        """Primeiro registro a ler para timestamps >= start (busca no índice esparso)"""
+        if start is None:
+            return 0
+        position = bisect.bisect_left(self.index_times, start) - 1
+        return self.index_records[position] if position >= 0 else 0
+    
+    def read(self, first_record, last_record, chunk_records=4096):
+        """Itera (timestamp, código, app_id) dos registros [first_record, last_record)"""
+        with open(self.path, "rb") as f:
+            f.seek(len(SEGMENT_MAGIC) + first_record * RECORD.size)
+            remaining = last_record - first_record
+            while remaining > 0:
+                raw = f.read(min(remaining, chunk_records) * RECORD.size)
+                if not raw:
+                    return
+                usable = len(raw) - len(raw) % RECORD.size
+                yield from RECORD.iter_unpack(raw[:usable])
+                remaining -= usable // RECORD.size
+
+
+class AuditLog:
+    """Log de auditoria: gravação assíncrona (fila + thread) e consulta por intervalo de tempo
+    
+    Os timestamps nunca retrocedem dentro do log (relógio ajustado para trás é
+    nivelado ao último), o que mantém a busca binária no índice válida.
+    """
+    
+    def __init__(self, directory, segment_max_bytes=64 * 1024 * 1024, index_interval=128,
+                 queue_size=10000, max_segments=0):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.index_interval = index_interval
+        self.max_segments = max_segments
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._segments = []
+        self._file = None
+        self._index_file = None
+        self._thread = None
+        self._lock_file = None
+        self.enabled = False
+        self.written = 0
+        self.dropped = 0
+    
+    def open(self):
+        """Carrega os segmentos existentes; retorna False se outro processo já grava no diretório"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = open(os.path.join(self.directory, "LOCK"), "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._lock_file.close()
+                self._lock_file = None
+                return False
+        
+        for name in sorted(os.listdir(self.directory)):
+            if name.startswith("segment-") and name.endswith(".log"):
+                segment = AuditSegment(os.path.join(self.directory, name))
+                segment.load(self.index_interval)
+                self._segments.append(segment)
+        
+        if not self._segments:
+            self._new_segment()
+        else:
+            self._open_active(self._segments[-1])
+        self.enabled = True
+        return True
+    
+    def _new_segment(self):
+        number = int(os.path.basename(self._segments[-1].path)[8:-4]) + 1 if self._segments else 1
+        segment = AuditSegment(os.path.join(self.directory, f"segment-{number:06d}.log"))
+        with open(segment.path, "wb") as f:
+            f.write(SEGMENT_MAGIC)
+        open(segment.index_path, "wb").close()
+        self._segments.append(segment)
+        self._open_active(segment)
+        
+        if self.max_segments and len(self._segments) > self.max_segments:
+            for old in self._segments[:-self.max_segments]:
+                os.remove(old.path)
+                os.remove(old.index_path)
+            self._segments = self._segments[-self.max_segments:]
+    
+    def _open_active(self, segment):
+        if self._file is not None:
+            self._file.close()
+            self._index_file.close()
+        self._file = open(segment.path, "ab")
+        self._index_file = open(segment.index_path, "ab")
+    
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+    
+    def record(self, event_type, app_id, timestamp=None):
+        """Enfileira um evento (não bloqueia: com a fila cheia o evento é descartado e contado)"""
+        code = EVENT_CODES.get(event_type)
+        if not self.enabled or code is None:
+            return
+        try:
+            self._queue.put_nowait((timestamp or time.time(), code, app_id))
+        except queue.Full:
+            self.dropped += 1
+    
+    def on_app_event(self, event_type, payload):
+        """Listener do gerenciador de conexões"""
+        self.record(event_type, payload["app_id"])
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while len(batch) < 1024:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stop = None in batch
+            try:
+                self._write([entry for entry in batch if entry is not None])
+            except Exception as e:
+                logger.error(f"❌ Erro gravando log de auditoria: {e}")
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+    
+    def _write(self, events):
+        if not events:
+            return
+        with self._lock:
+            segment = self._segments[-1]
+            records, index = bytearray(), bytearray()
+            for timestamp, code, app_id in events:
+                if segment.size() + len(records) + RECORD.size > self.segment_max_bytes and segment.count:
+                    self._append(segment, records, index)
+                    records, index = bytearray(), bytearray()
+                    self._new_segment()
+                    segment = self._segments[-1]
+                
+                if segment.last_time is not None and timestamp < segment.last_time:
+                    timestamp = segment.last_time
+                if segment.count % self.index_interval == 0:
+                    index += INDEX_ENTRY.pack(timestamp, segment.count)
+                    segment.index_times.append(timestamp)
+                    segment.index_records.append(segment.count)
+                records += RECORD.pack(timestamp, code, app_id.encode("ascii", "replace")[:31])
+                segment.count += 1
+                segment.last_time = timestamp
+            self._append(segment, records, index)
+            self.written += len(events)
+    
+    def _append(self, segment, records, index):
+        # Registros antes do índice: uma entrada do índice nunca aponta para dados ausentes
+        self._file.write(records)
+        self._file.flush()
+        if index:
+            self._index_file.write(index)
+            self._index_file.flush()
+    
+    def flush(self):
+        """Aguarda a gravação dos eventos já enfileirados"""
+        if self._thread is not None:
+            self._queue.join()
+    
+    def close(self):
+        """Grava o que está na fila, sincroniza e fecha os arquivos"""
+        if not self.enabled:
+            return 0
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self.enabled = False
+            for f in (self._file, self._index_file):
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+            if self._lock_file is not None:
+                self._lock_file.close()
+        return self.written
+    
+    def query(self, app_id=None, start=None, end=None, event_types=None, limit=1000):
+        """Eventos em [start, end] (epoch), em ordem cronológica; lê só os segmentos e blocos do intervalo"""
+        codes = {EVENT_CODES[name] for name in event_types} if event_types else None
+        wanted = app_id.encode("ascii", "replace")[:31].ljust(31, b"\0") if app_id else None
+        
+        with self._lock:
+            segments = [(segment, segment.count) for segment in self._segments if segment.count]
+        
+        events = []
+        for segment, count in segments:
+            if end is not None and segment.first_time > end:
+                break
+            if start is not None and segment.last_time < start:
+                continue
+            
+            try:
+                for timestamp, code, raw_app_id in segment.read(segment.start_record(start), count):
+                    if end is not None and timestamp > end:
+                        return events
+                    if start is not None and timestamp < start:
+                        continue
+                    if (wanted is not None and raw_app_id != wanted) or (codes is not None and code not in codes):
+                        continue
+                    events.append({
+                        "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+                        "event": EVENT_TYPES[code - 1] if 0 < code <= len(EVENT_TYPES) else f"unknown:{code}",
+                        "app_id": raw_app_id.rstrip(b"\0").decode("ascii")
+                    })
+                    if len(events) >= limit:
+                        return events
+            except FileNotFoundError:
+                # Segmento removido pela retenção durante a consulta
+                continue
+        return events
+    
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "segments": len(self._segments),
+                "records": sum(segment.count for segment in self._segments),
+                "bytes": sum(segment.size() for segment in self._segments),
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped
+            }
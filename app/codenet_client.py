@@ -5,6 +5,9 @@ Classe pronta para usar em suas aplicações
 
 import os
 import json
+import time
+import hmac
+import hashlib
 import requests
 import logging
 from datetime import datetime
@@ -27,6 +30,7 @@ class CodeNetClient:
         self.server_url = server_url.rstrip('/')
         self.credentials_file = credentials_file
         self.api_key = None
+        self.secret = None
         self.session_token = None
         self.app_id = None
         
@@ -42,6 +46,7 @@ class CodeNetClient:
                 with open(self.credentials_file, 'r') as f:
                     creds = json.load(f)
                     self.api_key = creds.get('api_key')
+                    self.secret = creds.get('secret')
                     self.app_id = creds.get('app_id')
                     logger.info("Credenciais carregadas do arquivo")
             except Exception as e:
@@ -94,6 +99,7 @@ class CodeNetClient:
                 result = response.json()['data']
                 
                 self.api_key = result['api_key']
+                self.secret = result['secret']
                 self.app_id = result['app_id']
                 
                 # Salvar credenciais
@@ -179,6 +185,59 @@ class CodeNetClient:
             logger.error(f"Exceção ao desconectar: {e}")
             return False
     
+    def refresh_session(self, rotate: bool = False) -> bool:
+        """
+        Renova a sessão atual sem reconectar
+        
+        Args:
+            rotate: Se True, o servidor emite um novo session token
+            
+        Returns:
+            True se renovada com sucesso
+        """
+        if not self.session_token:
+            logger.warning("Não conectado")
+            return False
+        
+        try:
+            url = f"{self.server_url}/api/session/refresh"
+            headers = {"Authorization": f"Bearer {self.session_token}"}
+            
+            response = requests.post(url, json={"rotate": rotate}, headers=headers, timeout=10)
+            
+            if response.status_code == 200:
+                self.session_token = response.json()['data']['session_token']
+                logger.info("🔄 Sessão renovada")
+                return True
+            else:
+                logger.error(f"Erro ao renovar sessão: {response.json()}")
+                return False
+                
+        except Exception as e:
+            logger.error(f"Exceção ao renovar sessão: {e}")
+            return False
+    
+    def heartbeat(self) -> bool:
+        """
+        Envia um heartbeat de presença ao servidor
+        
+        Returns:
+            True se a sessão continua válida
+        """
+        if not self.session_token:
+            return False
+        
+        try:
+            url = f"{self.server_url}/api/heartbeat"
+            headers = {"Authorization": f"Bearer {self.session_token}"}
+            
+            response = requests.post(url, headers=headers, timeout=5)
+            return response.status_code == 200
+                
+        except Exception as e:
+            logger.warning(f"Falha no heartbeat: {e}")
+            return False
+    
     def get_status(self) -> Optional[Dict[str, Any]]:
         """
         Obtém status da sessão
@@ -257,6 +316,45 @@ class CodeNetClient:
         except Exception as e:
             logger.error(f"Erro na requisição: {e}")
             return None
+    
+    def signed_request(self, method: str, endpoint: str, body: bytes = b"",
+                       **kwargs) -> Optional[requests.Response]:
+        """
+        Faz uma requisição assinada com o secret (sem sessão)
+        
+        Requer security.signed_requests habilitado no servidor.
+        
+        Args:
+            method: GET, POST, etc
+            endpoint: Endpoint da API, incluindo query string (ex: /api/status)
+            body: Corpo da requisição em bytes
+            **kwargs: Argumentos para requests
+            
+        Returns:
+            Response object ou None em caso de erro
+        """
+        if not self.api_key or not self.secret:
+            logger.error("API key e secret necessários para requisições assinadas")
+            return None
+        
+        try:
+            timestamp = str(int(time.time()))
+            message = f"{method.upper()}\n{endpoint}\n{timestamp}\n{hashlib.sha256(body).hexdigest()}"
+            signature = hmac.new(self.secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+            
+            headers = kwargs.pop('headers', {})
+            headers.update({
+                "X-CodeNet-Key": self.api_key,
+                "X-CodeNet-Timestamp": timestamp,
+                "X-CodeNet-Signature": signature
+            })
+            
+            url = f"{self.server_url}{endpoint}"
+            return requests.request(method, url, data=body, headers=headers, timeout=10, **kwargs)
+            
+        except Exception as e:
+            logger.error(f"Erro na requisição assinada: {e}")
+            return None
 
 
 # ============ EXEMPLO DE USO ============
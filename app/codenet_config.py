@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+⚙️ CodeNet Config - Configuração tipada do servidor
+Esquema com padrões e limites, validação do server_config.json e sobrescrita por variáveis de ambiente
+"""
+
+import os
+import json
+import logging
+from logging.handlers import RotatingFileHandler
+
+CONFIG_FILE = "config/server_config.json"
+
+# Sobrescrita por ambiente: CODENET__SECAO__CHAVE=valor (ex.: CODENET__SECURITY__SESSION_DURATION_HOURS=12)
+ENV_PREFIX = "CODENET__"
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class Setting:
+    """Uma chave do esquema: tipo, padrão e restrições"""
+    
+    def __init__(self, kind, default, minimum=None, maximum=None, choices=None):
+        self.kind = kind
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = choices
+    
+    def coerce(self, value):
+        """Converte e valida um valor (do JSON ou de uma variável de ambiente)"""
+        if isinstance(value, str) and self.kind is not str:
+            value = self._parse(value)
+        
+        if self.kind is bool:
+            if not isinstance(value, bool):
+                raise ValueError("esperado booleano")
+        elif self.kind in (int, float):
+            # bool é subclasse de int: true/false não valem como número
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError("esperado número")
+            if self.kind is int:
+                if value != int(value):
+                    raise ValueError("esperado inteiro")
+                value = int(value)
+            else:
+                value = float(value)
+            if self.minimum is not None and value < self.minimum:
+                raise ValueError(f"mínimo {self.minimum}")
+            if self.maximum is not None and value > self.maximum:
+                raise ValueError(f"máximo {self.maximum}")
+        elif not isinstance(value, str):
+            raise ValueError("esperado texto")
+        
+        if self.choices is not None and value not in self.choices:
+            raise ValueError(f"valores aceitos: {', '.join(self.choices)}")
+        return value
+    
+    def _parse(self, text):
+        if self.kind is bool:
+            lowered = text.strip().lower()
+            if lowered in ("1", "true", "yes", "on"):
+                return True
+            if lowered in ("0", "false", "no", "off"):
+                return False
+            raise ValueError("esperado booleano")
+        try:
+            return self.kind(text)
+        except ValueError:
+            raise ValueError(f"esperado {'inteiro' if self.kind is int else 'número'}")
+
+
+CONFIG_SCHEMA = {
+    "server_info": {
+        "name": Setting(str, "CodeNet Server"),
+        "version": Setting(str, "3.0.0"),
+        "build_date": Setting(str, ""),
+        "developer": Setting(str, ""),
+        "license": Setting(str, "")
+    },
+    "performance": {
+        "cache_enabled": Setting(bool, True),
+        "cache_timeout": Setting(int, 60, minimum=0),
+        "max_connections": Setting(int, 1000, minimum=1),
+        "request_timeout": Setting(int, 30, minimum=1),
+        "server_timing": Setting(bool, False),
+        "slow_request_threshold_ms": Setting(int, 2000, minimum=0),
+        "max_batch_size": Setting(int, 10000, minimum=1)
+    },
+    "security": {
+        "session_duration_hours": Setting(int, 24, minimum=1),
+        "max_failed_attempts": Setting(int, 5, minimum=0),
+        "rate_limit_per_minute": Setting(int, 100, minimum=0),
+        "max_sessions_per_app": Setting(int, 0, minimum=0),
+        "credential_filter": Setting(bool, True),
+        "signed_requests": Setting(bool, False),
+        "signature_window_seconds": Setting(int, 300, minimum=1)
+    },
+    "validation": {
+        "register_max_body_bytes": Setting(int, 8192, minimum=64),
+        "connect_max_body_bytes": Setting(int, 1024, minimum=64)
+    },
+    "events": {
+        "history_size": Setting(int, 1000, minimum=0),
+        "subscriber_buffer": Setting(int, 256, minimum=1),
+        "keepalive_seconds": Setting(float, 15, minimum=1)
+    },
+    "archive": {
+        "enabled": Setting(bool, True),
+        "idle_days": Setting(float, 180, minimum=0),
+        "interval_seconds": Setting(float, 3600, minimum=0),
+        "shards": Setting(int, 64, minimum=1, maximum=4096)
+    },
+    "audit": {
+        "enabled": Setting(bool, True),
+        "segment_max_mb": Setting(float, 64, minimum=0.01),
+        "index_interval": Setting(int, 128, minimum=1),
+        "queue_size": Setting(int, 10000, minimum=1),
+        "max_segments": Setting(int, 0, minimum=0)
+    },
+    "presence": {
+        "enabled": Setting(bool, True),
+        "stale_after_seconds": Setting(float, 120, minimum=1),
+        "offline_after_seconds": Setting(float, 600, minimum=1),
+        "tick_seconds": Setting(float, 1, minimum=0.1)
+    },
+    "usage": {
+        "top_endpoints": Setting(int, 32, minimum=1),
+        "flush_interval_seconds": Setting(float, 60, minimum=0)
+    },
+    "replication": {
+        "role": Setting(str, "none", choices=("none", "leader", "follower")),
+        "bind": Setting(str, "127.0.0.1:9100"),
+        "leader": Setting(str, "127.0.0.1:9100"),
+        "leader_url": Setting(str, "http://127.0.0.1:8000"),
+        "log_size": Setting(int, 100000, minimum=1),
+        "read_your_writes_timeout": Setting(float, 2.0, minimum=0)
+    },
+    "shutdown": {
+        "drain_timeout_seconds": Setting(float, 8, minimum=0)
+    },
+    "config_watcher": {
+        "enabled": Setting(bool, True),
+        "interval_seconds": Setting(float, 2.0, minimum=0.1)
+    },
+    "proxy": {
+        "host": Setting(str, "0.0.0.0"),
+        "port": Setting(int, 8000, minimum=1, maximum=65535),
+        "workers": Setting(int, 0, minimum=0),
+        "worker_base_port": Setting(int, 8101, minimum=1, maximum=65535),
+        "data_dir": Setting(str, "config/workers"),
+        "virtual_nodes": Setting(int, 160, minimum=1),
+        "pool_size": Setting(int, 32, minimum=0),
+        "backend_timeout": Setting(float, 30, minimum=0.1),
+        "health_interval_seconds": Setting(float, 2.0, minimum=0.1),
+        "health_timeout_seconds": Setting(float, 2.0, minimum=0.1),
+        "fail_threshold": Setting(int, 2, minimum=1)
+    },
+    "logging": {
+        "level": Setting(str, "INFO", choices=("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")),
+        "max_log_size_mb": Setting(float, 50, minimum=0),
+        "backup_count": Setting(int, 5, minimum=0),
+        "log_file_path": Setting(str, "logs/CodeNet_server.log")
+    }
+}
+
+
+def default_config():
+    """Configuração completa só com os valores padrão"""
+    return {
+        section: {key: setting.default for key, setting in settings.items()}
+        for section, settings in CONFIG_SCHEMA.items()
+    }
+
+
+def env_overrides(environ=None):
+    """Valores de CODENET__SECAO__CHAVE -> {"secao.chave": (nome da variável, texto)}"""
+    environ = os.environ if environ is None else environ
+    overrides = {}
+    for name, value in environ.items():
+        if not name.startswith(ENV_PREFIX):
+            continue
+        section, _, key = name[len(ENV_PREFIX):].lower().partition("__")
+        overrides[f"{section}.{key}"] = (name, value)
+    return overrides
+
+
+def is_env_error(key):
+    """Erro vindo do ambiente (chave = nome da variável), não do arquivo"""
+    return key.startswith(ENV_PREFIX)
+
+
+def load_config(path=CONFIG_FILE, environ=None):
+    """Padrões <- arquivo <- ambiente, validados; retorna (config, erros)
+    
+    Chaves inválidas ficam com o valor anterior (padrão ou arquivo) e aparecem em erros:
+    {"secao.chave": motivo} para o arquivo, {"CODENET__SECAO__CHAVE": motivo} para o ambiente.
+    Seções e chaves fora do esquema são mantidas como estão.
+    """
+    config = default_config()
+    errors = {}
+    
+    data = {}
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8-sig") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("esperado objeto JSON")
+        except (OSError, ValueError) as e:
+            errors["arquivo"] = str(e)
+            data = {}
+    
+    sources = []
+    for section, values in data.items():
+        if not isinstance(values, dict):
+            errors[section] = "seção deve ser um objeto JSON"
+            continue
+        sources += [(f"{section}.{key}", value, None) for key, value in values.items()]
+    sources += [(name, value, variable) for name, (variable, value) in env_overrides(environ).items()]
+    
+    for name, value, variable in sources:
+        section, _, key = name.partition(".")
+        setting = CONFIG_SCHEMA.get(section, {}).get(key)
+        if setting is None:
+            # Chave extra no arquivo é preservada; no ambiente é quase sempre erro de digitação
+            if variable:
+                errors[variable] = "chave desconhecida"
+            else:
+                config.setdefault(section, {})[key] = value
+            continue
+        try:
+            config[section][key] = setting.coerce(value)
+        except ValueError as e:
+            errors[variable or name] = str(e)
+    
+    return config, errors
+
+
+def flatten_config(config, prefix=""):
+    """{"secao": {"chave": v}} -> {"secao.chave": v}"""
+    flat = {}
+    for key, value in config.items():
+        if isinstance(value, dict):
+            flat.update(flatten_config(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def configure_logging(logging_config):
+    """Aplica nível e arquivo de log (com rotação) ao logger raiz"""
+    root = logging.getLogger()
+    root.setLevel(logging_config["level"])
+    
+    path = logging_config["log_file_path"]
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.FileHandler):
+            root.removeHandler(handler)
+            handler.close()
+    if not path:
+        return
+    
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handler = RotatingFileHandler(
+        path,
+        maxBytes=int(logging_config["max_log_size_mb"] * 1024 * 1024),
+        backupCount=logging_config["backup_count"],
+        encoding="utf-8"
+    )
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(handler)
@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+"""
+🔀 CodeNet Proxy - Proxy reverso local para workers do CodeNet Server v3.0
+Distribui credenciais entre N workers (stores em memória por worker) via hash consistente
+"""
+
+import os
+import sys
+import json
+import time
+import hmac
+import hashlib
+import bisect
+import logging
+import argparse
+import itertools
+import threading
+import subprocess
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from codenet_config import ENV_PREFIX, LOG_FORMAT, load_config
+
+logger = logging.getLogger("codenet_proxy")
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_SCRIPT = os.path.join(ROOT_DIR, "app", "codenet_server_v3.py")
+CONFIG_FILE = os.path.join(ROOT_DIR, "config", "server_config.json")
+
+# Headers que não atravessam o proxy (RFC 7230, seção 6.1)
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade"
+}
+
+# Rotas administrativas por app: o app_id não segue o anel (a app fica no worker que a registrou),
+# então vão a todos os workers e as respostas são combinadas
+FAN_OUT_PREFIXES = ("/api/admin/apps/", "/api/admin/keys/")
+
+
+class HashRing:
+    """Anel de hash consistente com nós virtuais
+    
+    Usado pelo proxy para rotear e pelos workers para emitir apenas
+    credenciais que o anel completo roteia de volta a eles mesmos.
+    """
+    
+    def __init__(self, nodes=(), virtual_nodes=160):
+        self.virtual_nodes = virtual_nodes
+        self.nodes = sorted(set(nodes))
+        points = sorted(
+            (self._hash(f"{node}#{replica}"), node)
+            for node in self.nodes
+            for replica in range(virtual_nodes)
+        )
+        self._hashes = [point for point, node in points]
+        self._owners = [node for point, node in points]
+    
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.sha1(value.encode("utf-8")).digest()[:8], "big")
+    
+    def node_for(self, key):
+        """Nó dono da chave (None se o anel está vazio)"""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+class Backend:
+    """Worker do CodeNet Server com pool de conexões keep-alive"""
+    
+    def __init__(self, address, pool_size=32, timeout=30):
+        self.address = address
+        self.host, port = address.rsplit(":", 1)
+        self.port = int(port)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.healthy = True
+        self.failures = 0
+        self.process = None
+        self._idle = []
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Conexão do pool (ou nova); retorna (conexão, reutilizada)"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout), False
+    
+    def release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+    
+    def close_idle(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class CodeNetProxy:
+    """Roteia requests para o worker dono da credencial"""
+    
+    def __init__(self, addresses, virtual_nodes=160, pool_size=32, backend_timeout=30,
+                 health_interval=2.0, health_timeout=2.0, fail_threshold=2):
+        self.backends = {address: Backend(address, pool_size, backend_timeout) for address in addresses}
+        self.virtual_nodes = virtual_nodes
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.fail_threshold = fail_threshold
+        self._round_robin = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.requests_routed = 0
+        self._rebuild_ring()
+    
+    # ========== ROTEAMENTO ==========
+    
+    def _rebuild_ring(self):
+        """Anel apenas com workers saudáveis (chaves de um worker ejetado migram aos vizinhos)"""
+        healthy = [address for address, backend in self.backends.items() if backend.healthy]
+        self.ring = HashRing(healthy, self.virtual_nodes)
+    
+    @staticmethod
+    def routing_key(method, path, headers, body):
+        """Credencial que identifica o worker dono (None = qualquer worker)"""
+        auth_header = headers.get("Authorization", "")
+        if auth_header.startswith("Bearer "):
+            return auth_header[7:]
+        
+        api_key = headers.get("X-CodeNet-Key")
+        if api_key:
+            return api_key
+        
+        if method == "POST" and path.split("?", 1)[0] == "/api/connect" and body:
+            try:
+                return json.loads(body).get("api_key") or None
+            except (ValueError, AttributeError):
+                return None
+        return None
+    
+    @staticmethod
+    def is_fan_out(path):
+        return path.split("?", 1)[0].startswith(FAN_OUT_PREFIXES)
+    
+    def healthy_backends(self):
+        ring = self.ring
+        return [self.backends[address] for address in ring.nodes]
+    
+    @staticmethod
+    def merge_responses(responses):
+        """Combina as respostas (status, payload) dos workers a uma rota administrativa por app
+        
+        Sem nenhum 200 (ex.: token inválido, app inexistente em todos) vale a primeira resposta.
+        """
+        successful = [payload for status, payload in responses if status == 200]
+        if not successful:
+            return responses[0]
+        
+        merged = dict(successful[0])
+        data = merged["data"] = dict(successful[0]["data"])
+        if "sessions" in data:
+            data["sessions"] = [session for payload in successful for session in payload["data"]["sessions"]]
+            data["total"] = len(data["sessions"])
+        if "revoked_sessions" in data:
+            data["revoked_sessions"] = sum(payload["data"]["revoked_sessions"] for payload in successful)
+        if "results" in data:
+            # Uma entrada por app: a do worker que a encontrou, senão o erro do primeiro
+            results = {}
+            for payload in successful:
+                for item in payload["data"]["results"]:
+                    current = results.get(item["app_id"])
+                    if current is None or (item["success"] and not current["success"]):
+                        results[item["app_id"]] = item
+            data["results"] = list(results.values())
+            for counter in ("rotated", "deactivated"):
+                if counter in data:
+                    data[counter] = sum(1 for item in data["results"] if item["success"])
+        return 200, merged
+    
+    def pick_backend(self, routing_key):
+        """Worker dono da chave; sem chave (ex.: registro), round-robin entre saudáveis"""
+        ring = self.ring
+        if routing_key is not None:
+            address = ring.node_for(routing_key)
+        elif ring.nodes:
+            address = ring.nodes[next(self._round_robin) % len(ring.nodes)]
+        else:
+            address = None
+        return self.backends.get(address)
+    
+    # ========== SAÚDE DOS WORKERS ==========
+    
+    def mark_failure(self, backend, reason):
+        with self._lock:
+            backend.failures += 1
+            if backend.healthy and backend.failures >= self.fail_threshold:
+                backend.healthy = False
+                backend.close_idle()
+                self._rebuild_ring()
+                logger.warning(f"⛔ Worker {backend.address} ejetado ({reason})")
+    
+    def mark_success(self, backend):
+        if backend.failures == 0 and backend.healthy:
+            return
+        with self._lock:
+            backend.failures = 0
+            if not backend.healthy:
+                backend.healthy = True
+                self._rebuild_ring()
+                logger.info(f"✅ Worker {backend.address} readmitido")
+    
+    def check_health(self, backend):
+        try:
+            conn = http.client.HTTPConnection(backend.host, backend.port, timeout=self.health_timeout)
+            try:
+                conn.request("GET", "/api/health")
+                response = conn.getresponse()
+                response.read()
+            finally:
+                conn.close()
+        except (OSError, http.client.HTTPException) as e:
+            self.mark_failure(backend, e)
+            return
+        
+        if response.status == 200:
+            self.mark_success(backend)
+        else:
+            self.mark_failure(backend, f"HTTP {response.status}")
+    
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            for backend in list(self.backends.values()):
+                if backend.process is not None and backend.process.poll() is not None:
+                    logger.warning(f"🔁 Worker {backend.address} encerrou (código {backend.process.returncode}); reiniciando")
+                    self.mark_failure(backend, "processo encerrado")
+                    backend.process = self._spawn(backend)
+                self.check_health(backend)
+    
+    # ========== WORKERS LOCAIS ==========
+    
+    def _spawn(self, backend):
+        env = dict(os.environ)
+        env.update({
+            "PORT": str(backend.port),
+            "CODENET_WORKER_ID": backend.address,
+            "CODENET_WORKER_RING": ",".join(self.backends),
+            "CODENET_DATA_DIR": os.path.join(self.data_dir, f"worker-{backend.port}"),
+            "CODENET_REPLICATION_ROLE": "none"
+        })
+        return subprocess.Popen(
+            [sys.executable, SERVER_SCRIPT],
+            cwd=ROOT_DIR, env=env,
+            stdout=subprocess.DEVNULL
+        )
+    
+    def spawn_workers(self, data_dir):
+        """Inicia um processo do servidor por worker, cada um com seu diretório de dados"""
+        self.data_dir = data_dir
+        for backend in self.backends.values():
+            backend.process = self._spawn(backend)
+            logger.info(f"🚀 Worker iniciado: {backend.address} (PID {backend.process.pid})")
+    
+    def wait_ready(self, timeout=30):
+        """Aguarda os workers responderem ao health check antes de aceitar requests"""
+        deadline = time.monotonic() + timeout
+        pending = list(self.backends.values())
+        while pending and time.monotonic() < deadline:
+            for backend in list(pending):
+                try:
+                    conn = http.client.HTTPConnection(backend.host, backend.port, timeout=1)
+                    conn.request("GET", "/api/health")
+                    conn.getresponse().read()
+                    conn.close()
+                    pending.remove(backend)
+                except (OSError, http.client.HTTPException):
+                    pass
+            time.sleep(0.2)
+        for backend in pending:
+            logger.warning(f"⚠️ Worker {backend.address} não respondeu em {timeout}s")
+    
+    def stop_workers(self):
+        for backend in self.backends.values():
+            if backend.process is not None:
+                backend.process.terminate()
+        for backend in self.backends.values():
+            if backend.process is not None:
+                backend.process.wait(timeout=10)
+    
+    # ========== SERVIDOR ==========
+    
+    def status(self):
+        return {
+            "workers": [
+                {
+                    "address": backend.address,
+                    "healthy": backend.healthy,
+                    "failures": backend.failures,
+                    "idle_connections": len(backend._idle),
+                    "pid": backend.process.pid if backend.process is not None else None
+                }
+                for backend in self.backends.values()
+            ],
+            "ring_size": len(self.ring.nodes),
+            "requests_routed": self.requests_routed
+        }
+    
+    def serve(self, host, port):
+        handler = type("Handler", (ProxyRequestHandler,), {"proxy": self})
+        
+        threading.Thread(target=self._health_loop, name="proxy-health", daemon=True).start()
+        httpd = ThreadingHTTPServer((host, port), handler)
+        httpd.daemon_threads = True
+        logger.info(f"🔀 Proxy ouvindo em http://{host}:{port} ({len(self.backends)} workers)")
+        try:
+            httpd.serve_forever()
+        finally:
+            self._stop.set()
+            httpd.server_close()
+
+
+class ProxyRequestHandler(BaseHTTPRequestHandler):
+    """Encaminha o request ao worker escolhido (respostas sem tamanho são repassadas em streaming)"""
+    
+    protocol_version = "HTTP/1.1"
+    proxy = None
+    
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+    
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _authorized(self):
+        """Mesmo token administrativo dos workers (CODENET_ADMIN_TOKEN)"""
+        admin_token = os.environ.get("CODENET_ADMIN_TOKEN")
+        if not admin_token:
+            self._send_json(403, {
+                "error": "Endpoints administrativos desativados",
+                "message": "Defina CODENET_ADMIN_TOKEN para habilitá-los"
+            })
+            return False
+        token = self.headers.get("X-Admin-Token", "")
+        if not hmac.compare_digest(token.encode(), admin_token.encode()):
+            self._send_json(403, {"error": "Acesso negado", "message": "Token administrativo inválido"})
+            return False
+        return True
+    
+    def _handle(self):
+        if self.path == "/proxy/status":
+            if self._authorized():
+                self._send_json(200, self.proxy.status())
+            return
+        
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            self.close_connection = True
+            return self._send_json(411, {"error": "Content-Length obrigatório"})
+        
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        
+        if self.proxy.is_fan_out(self.path):
+            return self._fan_out(body)
+        
+        backend = self.proxy.pick_backend(
+            self.proxy.routing_key(self.command, self.path, self.headers, body)
+        )
+        if backend is None:
+            return self._send_json(503, {"error": "Nenhum worker disponível"})
+        
+        forwarded = self._forward(backend, body)
+        if forwarded is None:
+            return self._send_json(502, {"error": "Worker indisponível"})
+        
+        self.proxy.requests_routed += 1
+        self._relay(backend, *forwarded)
+    
+    def _forward(self, backend, body):
+        """Envia o request ao worker; retorna (conexão, resposta) ou None se ele falhou"""
+        headers = {name: value for name, value in self.headers.items()
+                   if name.lower() not in HOP_BY_HOP_HEADERS and name.lower() != "host"}
+        headers["Host"] = f"{backend.host}:{backend.port}"
+        headers["X-Forwarded-For"] = self.client_address[0]
+        
+        # Conexão reutilizada pode ter sido fechada pelo worker: uma nova tentativa
+        for attempt in range(2):
+            conn, reused = backend.acquire()
+            try:
+                conn.request(self.command, self.path, body=body, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                self.proxy.mark_failure(backend, e)
+                return None
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                self.proxy.mark_failure(backend, e)
+                return None
+    
+    def _fan_out(self, body):
+        """Envia a rota administrativa a todos os workers saudáveis e responde com o resultado combinado"""
+        backends = self.proxy.healthy_backends()
+        if not backends:
+            return self._send_json(503, {"error": "Nenhum worker disponível"})
+        
+        responses = []
+        for backend in backends:
+            forwarded = self._forward(backend, body)
+            if forwarded is None:
+                return self._send_json(502, {"error": f"Worker indisponível: {backend.address}"})
+            conn, response = forwarded
+            try:
+                payload = json.loads(response.read())
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                conn.close()
+                self.proxy.mark_failure(backend, e)
+                return self._send_json(502, {"error": f"Resposta inválida do worker {backend.address}"})
+            if response.will_close:
+                conn.close()
+            else:
+                backend.release(conn)
+            responses.append((response.status, payload))
+        
+        self.proxy.requests_routed += 1
+        self._send_json(*self.proxy.merge_responses(responses))
+    
+    def _relay(self, backend, conn, response):
+        """Repassa a resposta do worker (streaming para SSE e respostas sem Content-Length)"""
+        streaming = response.getheader("Content-Length") is None and response.status not in (204, 304) \
+            and self.command != "HEAD"
+        
+        self.send_response(response.status, response.reason)
+        for name, value in response.getheaders():
+            if name.lower() not in HOP_BY_HOP_HEADERS:
+                self.send_header(name, value)
+        self.send_header("X-CodeNet-Worker", backend.address)
+        if streaming:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        
+        try:
+            if streaming:
+                while True:
+                    chunk = response.read1(65536)
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    self.wfile.flush()
+            else:
+                self.wfile.write(response.read())
+        except OSError:
+            # Cliente desconectou no meio da resposta
+            self.close_connection = True
+            conn.close()
+            return
+        
+        if streaming or response.will_close:
+            conn.close()
+        else:
+            backend.release(conn)
+    
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = do_HEAD = _handle
+
+
+def load_proxy_config(path=CONFIG_FILE):
+    """Seção "proxy" do server_config.json (validada, com sobrescritas CODENET__PROXY__*)"""
+    config, errors = load_config(path)
+    for key, error in errors.items():
+        if key.startswith("proxy.") or key.upper().startswith(f"{ENV_PREFIX}PROXY__") or key == "arquivo":
+            logger.error(f"⚙️ Configuração inválida em {key}: {error} (ignorada)")
+    return config["proxy"]
+
+
+def main():
+    """Função principal"""
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    config = load_proxy_config()
+    
+    parser = argparse.ArgumentParser(description="Proxy reverso com hash consistente para workers do CodeNet Server")
+    parser.add_argument("--host", default=config["host"])
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", config["port"])))
+    parser.add_argument("--workers", type=int, default=config["workers"] or os.cpu_count(),
+                        help="workers locais a iniciar (padrão: núcleos da CPU)")
+    parser.add_argument("--worker-base-port", type=int, default=config["worker_base_port"])
+    parser.add_argument("--backend", action="append", default=[],
+                        help="host:porta de um worker já em execução (não inicia workers locais); "
+                             "o worker precisa de CODENET_WORKER_ID/CODENET_WORKER_RING com os mesmos endereços")
+    parser.add_argument("--data-dir", default=config["data_dir"])
+    args = parser.parse_args()
+    
+    addresses = args.backend or [f"127.0.0.1:{args.worker_base_port + i}" for i in range(args.workers)]
+    proxy = CodeNetProxy(
+        addresses,
+        virtual_nodes=config["virtual_nodes"],
+        pool_size=config["pool_size"],
+        backend_timeout=config["backend_timeout"],
+        health_interval=config["health_interval_seconds"],
+        health_timeout=config["health_timeout_seconds"],
+        fail_threshold=config["fail_threshold"]
+    )
+    
+    print("=" * 60)
+    print("🔀 CodeNet PROXY - Hash consistente por credencial")
+    print("=" * 60)
+    
+    if not args.backend:
+        proxy.spawn_workers(os.path.join(ROOT_DIR, args.data_dir))
+        proxy.wait_ready()
+    
+    try:
+        proxy.serve(args.host, args.port)
+    except KeyboardInterrupt:
+        print("\n\n⏹️  Proxy parado")
+    finally:
+        proxy.stop_workers()
+
+
+if __name__ == "__main__":
+    main()
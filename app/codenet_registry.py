@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+📦 CodeNet Registry - Exportação/importação do registro em NDJSON
+Apps, API keys e sessões em streaming (memória constante), online ou direto nos arquivos
+"""
+
+import os
+import sys
+import json
+import argparse
+import requests
+from datetime import datetime
+
+REGISTRY_FORMAT = "codenet-registry"
+REGISTRY_VERSION = 1
+
+# Tipo de registro -> (store do servidor, arquivo, prefixo do id, campos obrigatórios)
+RECORD_TYPES = {
+    "app": ("apps", "connected_apps.json", "app_", ("app_id", "name", "version", "platform", "api_key", "status")),
+    "api_key": ("api_keys", "api_keys.json", "kgs_", ("app_name", "secret", "active")),
+    "session": ("sessions", "active_sessions.json", "sess_", ("app_id", "app_name", "expires_at", "connected_at", "requests"))
+}
+
+APP_STATUSES = ("registered", "connected", "stale", "offline", "disconnected", "revoked")
+
+
+def _is_text(value):
+    return isinstance(value, str)
+
+
+def _is_int(value):
+    # bool é subclasse de int: true/false não valem como contador
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_iso(value):
+    if not isinstance(value, str):
+        return False
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _nullable(check):
+    return lambda value: value is None or check(value)
+
+
+# Tipo de registro -> {campo: (esperado, verificação)}; campos opcionais só são verificados se presentes.
+# Valores aceitos aqui são usados sem nova checagem pelo servidor (ex.: expires_at em validate_session)
+FIELD_CHECKS = {
+    "app": {
+        "app_id": ("texto", _is_text),
+        "name": ("texto", _is_text),
+        "version": ("texto", _is_text),
+        "platform": ("texto", _is_text),
+        "description": ("texto", _is_text),
+        "api_key": ("texto", _is_text),
+        "status": (" | ".join(APP_STATUSES), lambda value: value in APP_STATUSES),
+        "registered_at": ("data ISO", _is_iso),
+        "last_connection": ("data ISO ou null", _nullable(_is_iso)),
+        "connection_count": ("inteiro", _is_int),
+        "credential_generation": ("inteiro", _is_int),
+        "endpoints_used": ("lista", lambda value: isinstance(value, list))
+    },
+    "api_key": {
+        "app_name": ("texto", _is_text),
+        "secret": ("texto", _is_text),
+        "active": ("booleano", lambda value: isinstance(value, bool)),
+        "created_at": ("data ISO", _is_iso),
+        "last_used": ("data ISO ou null", _nullable(_is_iso)),
+        "requests_count": ("inteiro", _is_int),
+        "rotated_to": ("texto ou null", _nullable(_is_text))
+    },
+    "session": {
+        "app_id": ("texto", _is_text),
+        "app_name": ("texto", _is_text),
+        "expires_at": ("data ISO", _is_iso),
+        "connected_at": ("data ISO", _is_iso),
+        "requests": ("inteiro", _is_int),
+        "generation": ("inteiro", _is_int)
+    }
+}
+
+
+def header_record(counts=None):
+    """Primeira linha do export"""
+    header = {
+        "type": "header",
+        "format": REGISTRY_FORMAT,
+        "version": REGISTRY_VERSION,
+        "exported_at": datetime.now().isoformat()
+    }
+    if counts is not None:
+        header["counts"] = counts
+    return header
+
+
+def end_record(records):
+    """Última linha do export (permite detectar streams truncados)"""
+    return {"type": "end", "records": records}
+
+
+def to_line(record):
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def validate_record(record):
+    """Valida um registro de dados (retorna o erro ou None)"""
+    if not isinstance(record, dict):
+        return "Registro deve ser um objeto JSON"
+    
+    record_type = record.get("type")
+    if record_type not in RECORD_TYPES:
+        return f"Tipo de registro desconhecido: {record_type}"
+    
+    store, filename, prefix, required = RECORD_TYPES[record_type]
+    record_id = record.get("id")
+    if not isinstance(record_id, str) or not record_id.startswith(prefix):
+        return f"id inválido para {record_type}: {record_id!r}"
+    
+    data = record.get("data")
+    if not isinstance(data, dict):
+        return "Campo data deve ser um objeto JSON"
+    for field in required:
+        if field not in data:
+            return f"Campo obrigatório em {record_type}: {field}"
+    for field, (expected, check) in FIELD_CHECKS[record_type].items():
+        if field in data and not check(data[field]):
+            return f"Campo inválido em {record_type}: {field} (esperado {expected})"
+    
+    if record_type == "app" and data["app_id"] != record_id:
+        return "app_id diferente do id do registro"
+    return None
+
+
+class JSONObjectReader:
+    """Itera os pares do objeto JSON de nível superior de um arquivo sem carregá-lo inteiro
+    
+    A memória fica limitada ao maior valor individual (ex.: uma app), não ao arquivo.
+    """
+    
+    def __init__(self, f, chunk_size=1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+    
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+    
+    def _peek(self):
+        """Próximo caractere não-branco (None no fim do arquivo)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return None
+    
+    def _expect(self, chars):
+        char = self._peek()
+        if char is None or char not in chars:
+            raise ValueError(f"JSON inválido: esperado {chars!r}, encontrado {char!r}")
+        self.pos += 1
+        return char
+    
+    def _decode(self):
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # Valor no fim do buffer pode estar truncado (ex.: número): ler mais
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+    
+    def __iter__(self):
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        
+        while True:
+            self._peek()
+            key = self._decode()
+            if not isinstance(key, str):
+                raise ValueError("JSON inválido: chave deve ser string")
+            self._expect(":")
+            self._peek()
+            yield key, self._decode()
+            
+            if self._expect(",}") == "}":
+                return
+
+
+class JSONObjectWriter:
+    """Grava um objeto JSON par a par (mesmo formato do json.dump com indent=2)"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.temp_path = f"{path}.tmp"
+        self.f = open(self.temp_path, "w", encoding="utf-8")
+        self.f.write("{")
+        self.count = 0
+    
+    def write(self, key, value):
+        separator = ",\n  " if self.count else "\n  "
+        encoded = json.dumps(value, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+        self.f.write(f"{separator}{json.dumps(key, ensure_ascii=False)}: {encoded}")
+        self.count += 1
+    
+    def close(self):
+        self.f.write("\n}" if self.count else "}")
+        self.f.close()
+        os.replace(self.temp_path, self.path)
+    
+    def abort(self):
+        self.f.close()
+        os.remove(self.temp_path)
+
+
+def iter_store_records(data_dir):
+    """Registros NDJSON lidos diretamente dos arquivos de dados (offline)"""
+    for record_type, (store, filename, prefix, required) in RECORD_TYPES.items():
+        path = os.path.join(data_dir, filename)
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8-sig") as f:
+            for key, value in JSONObjectReader(f):
+                yield {"type": record_type, "id": key, "data": value}
+
+
+# ========== CLI ==========
+
+def _admin_session(args):
+    token = args.token or os.environ.get("CODENET_ADMIN_TOKEN")
+    if not token:
+        sys.exit("❌ Informe --token ou defina CODENET_ADMIN_TOKEN")
+    session = requests.Session()
+    session.headers["X-Admin-Token"] = token
+    return session
+
+
+def _progress(message):
+    sys.stderr.write(f"\r{message}")
+    sys.stderr.flush()
+
+
+def export_registry(args):
+    """Exporta para NDJSON a partir do servidor (--url) ou dos arquivos (--data-dir)"""
+    output = open(args.output, "w", encoding="utf-8") if args.output != "-" else sys.stdout
+    written = 0
+    
+    try:
+        if args.url:
+            session = _admin_session(args)
+            with session.get(f"{args.url.rstrip('/')}/api/admin/registry/export", stream=True, timeout=60) as response:
+                response.raise_for_status()
+                for line in response.iter_lines(chunk_size=1 << 16):
+                    if line:
+                        output.write(line.decode("utf-8") + "\n")
+                        written += 1
+                        if written % 10000 == 0:
+                            _progress(f"📤 {written} linhas exportadas")
+        else:
+            output.write(to_line(header_record()))
+            records = 0
+            for record in iter_store_records(args.data_dir):
+                output.write(to_line(record))
+                records += 1
+                if records % 10000 == 0:
+                    _progress(f"📤 {records} registros exportados")
+            output.write(to_line(end_record(records)))
+            written = records + 2
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    
+    _progress(f"✅ Exportação concluída: {written} linhas\n")
+
+
+def _iter_input_lines(path):
+    source = open(path, "r", encoding="utf-8") if path != "-" else sys.stdin
+    try:
+        yield from source
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+
+def import_to_server(args):
+    """Envia o NDJSON ao servidor em streaming e mostra o progresso reportado"""
+    session = _admin_session(args)
+    
+    def body():
+        for line in _iter_input_lines(args.input):
+            yield line.encode("utf-8")
+    
+    url = f"{args.url.rstrip('/')}/api/admin/registry/import"
+    params = {"batch_size": args.batch_size, "on_conflict": args.on_conflict}
+    with session.post(url, params=params, data=body(), stream=True, timeout=None,
+                      headers={"Content-Type": "application/x-ndjson"}) as response:
+        if response.status_code != 200:
+            sys.exit(f"❌ Importação recusada ({response.status_code}): {response.text}")
+        
+        summary = None
+        for line in response.iter_lines():
+            if not line:
+                continue
+            message = json.loads(line)
+            if message["type"] == "progress":
+                _progress(f"📥 {message['lines']} linhas | {message['imported']} importados | "
+                          f"{message['skipped']} ignorados | {message['rejected']} rejeitados")
+            elif message["type"] == "error":
+                sys.stderr.write(f"\n⚠️ Linha {message['line']}: {message['error']}")
+            elif message["type"] == "summary":
+                summary = message
+    
+    return summary
+
+
+def import_to_files(args):
+    """Grava os arquivos de dados diretamente a partir do NDJSON (servidor parado)"""
+    os.makedirs(args.data_dir, exist_ok=True)
+    writers = {}
+    for record_type, (store, filename, prefix, required) in RECORD_TYPES.items():
+        path = os.path.join(args.data_dir, filename)
+        if os.path.exists(path) and not args.overwrite:
+            sys.exit(f"❌ {path} já existe (use --overwrite)")
+    
+    summary = {"type": "summary", "lines": 0, "imported": 0, "skipped": 0, "rejected": 0, "complete": False}
+    try:
+        for record_type, (store, filename, prefix, required) in RECORD_TYPES.items():
+            writers[record_type] = JSONObjectWriter(os.path.join(args.data_dir, filename))
+        
+        for line_number, line in enumerate(_iter_input_lines(args.input), 1):
+            summary["lines"] = line_number
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record, error = None, f"JSON inválido: {e}"
+            else:
+                error = None
+            
+            if isinstance(record, dict) and record.get("type") in ("header", "end"):
+                summary["complete"] = summary["complete"] or record["type"] == "end"
+                continue
+            
+            error = error or validate_record(record)
+            if error:
+                summary["rejected"] += 1
+                sys.stderr.write(f"\n⚠️ Linha {line_number}: {error}")
+                continue
+            
+            # Chaves repetidas: o json.load mantém a última, como no import online com replace
+            writers[record["type"]].write(record["id"], record["data"])
+            summary["imported"] += 1
+            if summary["imported"] % 10000 == 0:
+                _progress(f"📥 {summary['imported']} registros gravados")
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+    
+    for writer in writers.values():
+        writer.close()
+    return summary
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Exportação/importação NDJSON do registro do CodeNet Server")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    export_parser = commands.add_parser("export", help="exporta o registro para NDJSON")
+    export_parser.add_argument("-o", "--output", default="-", help="arquivo de saída (padrão: stdout)")
+    
+    import_parser = commands.add_parser("import", help="importa um NDJSON para o registro")
+    import_parser.add_argument("input", help="arquivo NDJSON (- para stdin)")
+    import_parser.add_argument("--batch-size", type=int, default=1000)
+    import_parser.add_argument("--on-conflict", choices=("replace", "skip"), default="replace")
+    import_parser.add_argument("--overwrite", action="store_true",
+                               help="com --data-dir: substitui arquivos de dados existentes")
+    
+    for command_parser in (export_parser, import_parser):
+        target = command_parser.add_mutually_exclusive_group(required=True)
+        target.add_argument("--url", help="servidor em execução (endpoints /api/admin/registry/*)")
+        target.add_argument("--data-dir", help="diretório dos arquivos de dados (servidor parado)")
+        command_parser.add_argument("--token", help="token administrativo (padrão: CODENET_ADMIN_TOKEN)")
+    
+    args = parser.parse_args()
+    
+    if args.command == "export":
+        export_registry(args)
+        return
+    
+    summary = import_to_server(args) if args.url else import_to_files(args)
+    if summary is None:
+        sys.exit("\n❌ Importação interrompida sem resumo")
+    
+    print(f"\n✅ Importação: {summary['imported']} importados, {summary['skipped']} ignorados, "
+          f"{summary['rejected']} rejeitados ({summary['lines']} linhas)")
+    if not summary["complete"]:
+        print("⚠️ Registro final ausente: o arquivo pode estar truncado")
+
+
+if __name__ == "__main__":
+    main()
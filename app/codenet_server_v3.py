@@ -7,42 +7,1737 @@ Sistema moderno de gerenciamento de conexões de aplicativos
 import os
 import sys
 import json
+import gzip
 import uuid
 import time
 import hmac
 import hashlib
 import logging
+import struct
+import math
+import bisect
+import itertools
+import signal
+import socket
+import socketserver
+import threading
+import io
+import marshal
+from array import array
+import cProfile
+import pstats
+import traceback
+from collections import deque, Counter
+from contextlib import contextmanager
+from functools import wraps
 from datetime import datetime, timedelta
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, g, has_request_context, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from werkzeug.serving import make_server
+import requests
 
-# Configuração de logging
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+from codenet_registry import RECORD_TYPES, header_record, end_record, to_line, validate_record
+from codenet_config import CONFIG_FILE, LOG_FORMAT, load_config, flatten_config, configure_logging, is_env_error
+from codenet_audit import AuditLog, EVENT_TYPES
+
+# Configuração de logging (arquivo com rotação aplicado ao carregar o server_config.json)
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/CodeNet_server.log', encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
+    format=LOG_FORMAT,
+    handlers=[logging.StreamHandler(sys.stdout)]
 )
 logger = logging.getLogger(__name__)
 
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def source_files():
+    """Módulos Python do servidor (app/*.py)"""
+    return sorted(
+        os.path.join(APP_DIR, name) for name in os.listdir(APP_DIR)
+        if name.endswith('.py')
+    )
+
+
+def source_fingerprint():
+    """Hash do código-fonte atual (detecta alterações para a recarga via SIGHUP)"""
+    digest = hashlib.sha1()
+    for path in source_files():
+        with open(path, 'rb') as f:
+            digest.update(path.encode() + b"\0" + f.read())
+    return digest.hexdigest()
+
+
+# ========== INSTRUMENTAÇÃO DE FASES ==========
+
+@contextmanager
+def timed_phase(name):
+    """Mede uma fase do request atual (acumula em g.phase_timings)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context():
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            timings = g.setdefault('phase_timings', {})
+            timings[name] = timings.get(name, 0.0) + elapsed_ms
+
+
+def phase_timed(name):
+    """Decorator que mede o método como uma fase do request"""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with timed_phase(name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def synchronized(f):
+    """Decorator que executa o método sob o lock (self._lock) da instância"""
+    @wraps(f)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return f(self, *args, **kwargs)
+    return wrapper
+
+
+class PhaseStats:
+    """Estatísticas agregadas por fase (contagem, média, máx, percentis)"""
+    
+    def __init__(self, sample_size=1024):
+        self._lock = threading.Lock()
+        self._sample_size = sample_size
+        self._phases = {}
+    
+    def record(self, timings):
+        """Agrega as durações (ms) de um request"""
+        with self._lock:
+            for name, duration in timings.items():
+                stats = self._phases.get(name)
+                if stats is None:
+                    stats = self._phases[name] = {
+                        "count": 0,
+                        "total_ms": 0.0,
+                        "max_ms": 0.0,
+                        "samples": deque(maxlen=self._sample_size)
+                    }
+                stats["count"] += 1
+                stats["total_ms"] += duration
+                stats["max_ms"] = max(stats["max_ms"], duration)
+                stats["samples"].append(duration)
+    
+    def snapshot(self):
+        """Retorna as estatísticas de todas as fases"""
+        with self._lock:
+            phases = {name: (dict(stats), sorted(stats["samples"]))
+                      for name, stats in self._phases.items()}
+        
+        result = {}
+        for name, (stats, samples) in phases.items():
+            result[name] = {
+                "count": stats["count"],
+                "total_ms": round(stats["total_ms"], 3),
+                "avg_ms": round(stats["total_ms"] / stats["count"], 3),
+                "max_ms": round(stats["max_ms"], 3),
+                "p50_ms": round(samples[len(samples) // 2], 3),
+                "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3)
+            }
+        return result
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider que mede a serialização das respostas"""
+    
+    def dumps(self, obj, **kwargs):
+        with timed_phase("serialize"):
+            return super().dumps(obj, **kwargs)
+
+
+# ========== PROFILING SOB DEMANDA ==========
+
+class InFlightRequests:
+    """Registro dos requests em andamento, por thread"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+    
+    def begin(self, route):
+        """Registra o request da thread atual"""
+        info = {"route": route, "started": time.perf_counter()}
+        with self._lock:
+            self._requests[threading.get_ident()] = info
+        return info
+    
+    def end(self):
+        """Remove o request da thread atual"""
+        with self._lock:
+            self._requests.pop(threading.get_ident(), None)
+    
+    def snapshot(self):
+        """Cópia de {thread_id: info} dos requests em andamento"""
+        with self._lock:
+            return dict(self._requests)
+
+
+class SlowRequestWatchdog:
+    """Thread que captura o stack de requests que excedem o limite de latência"""
+    
+    def __init__(self, inflight, threshold_ms):
+        self._inflight = inflight
+        self.threshold = threshold_ms / 1000
+        self.captured = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = False
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """Inicia a thread do watchdog (limite <= 0 desativa)"""
+        with self._lock:
+            self._started = True
+            if self.threshold <= 0 or self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="slow-request-watchdog", daemon=True)
+            self._thread.start()
+    
+    def set_threshold(self, threshold_ms):
+        """Altera o limite ao vivo; um limite positivo inicia a thread se ainda não existe"""
+        self.threshold = threshold_ms / 1000
+        if self._started:
+            self.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        while True:
+            # Intervalo recalculado a cada volta: o limite pode mudar ao vivo (0 pausa as verificações)
+            threshold = self.threshold
+            if self._stop.wait(max(threshold / 4, 0.05) if threshold > 0 else 1.0):
+                return
+            if self.threshold <= 0:
+                continue
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Erro no watchdog de requests lentos: {e}")
+    
+    def check(self):
+        """Verifica os requests em andamento e registra os lentos"""
+        now = time.perf_counter()
+        slow = {thread_id: info for thread_id, info in self._inflight.snapshot().items()
+                if not info.get("reported") and now - info["started"] > self.threshold}
+        if not slow:
+            return
+        
+        frames = sys._current_frames()
+        for thread_id, info in slow.items():
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            
+            info["reported"] = True
+            self.captured += 1
+            elapsed_ms = (now - info["started"]) * 1000
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(
+                f"🐢 Request lento ({elapsed_ms:.0f}ms em andamento): {info['route']} "
+                f"app_id={info.get('app_id')}\n{stack}"
+            )
+
+
+class ProfilerBusyError(Exception):
+    """Já existe uma sessão de profiling em andamento"""
+
+
+class RuntimeProfiler:
+    """Profiling do servidor em execução (cProfile ou amostragem de stacks)"""
+    
+    MODES = ("cprofile", "sampling")
+    
+    # A partir do Python 3.12 o cProfile usa sys.monitoring, que é global ao
+    # processo: um único profiler cobre todas as threads
+    GLOBAL_CPROFILE = sys.version_info >= (3, 12)
+    
+    def __init__(self, inflight):
+        self._inflight = inflight
+        self._session_lock = threading.Lock()
+        self._profiles = None
+    
+    @property
+    def active(self):
+        return self._session_lock.locked()
+    
+    def run(self, mode, seconds, interval_ms=5):
+        """Executa uma sessão de profiling (apenas uma por vez)"""
+        if not self._session_lock.acquire(blocking=False):
+            raise ProfilerBusyError("Já existe uma sessão de profiling em andamento")
+        
+        try:
+            logger.info(f"🔬 Profiling iniciado: {mode} por {seconds}s")
+            if mode == "cprofile":
+                return self._run_cprofile(seconds)
+            return self._run_sampling(seconds, interval_ms / 1000)
+        finally:
+            self._session_lock.release()
+    
+    def request_started(self):
+        """Ativa o cProfile no request atual se houver sessão (hook before_request)"""
+        profiles = self._profiles
+        if profiles is None or self.GLOBAL_CPROFILE:
+            return None
+        
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiles, profiler
+    
+    def request_finished(self, handle):
+        """Finaliza o cProfile do request atual (hook teardown_request)"""
+        profiles, profiler = handle
+        profiler.disable()
+        profiles.append(profiler)
+    
+    def _run_cprofile(self, seconds):
+        """Profiling determinístico dos requests atendidos durante a janela"""
+        profiles = []
+        global_profiler = None
+        
+        if self.GLOBAL_CPROFILE:
+            global_profiler = cProfile.Profile()
+            global_profiler.enable()
+        
+        self._profiles = profiles
+        try:
+            time.sleep(seconds)
+        finally:
+            self._profiles = None
+            if global_profiler is not None:
+                global_profiler.disable()
+                profiles.append(global_profiler)
+        
+        stats = pstats.Stats()
+        for profiler in list(profiles):
+            stats.add(profiler)
+        return stats
+    
+    def _run_sampling(self, seconds, interval):
+        """Amostragem periódica dos stacks das threads de request"""
+        own_thread = threading.get_ident()
+        stacks = Counter()
+        deadline = time.monotonic() + seconds
+        
+        while time.monotonic() < deadline:
+            frames = sys._current_frames()
+            for thread_id in self._inflight.snapshot():
+                frame = frames.get(thread_id)
+                if thread_id == own_thread or frame is None:
+                    continue
+                stacks[self._collapse(frame)] += 1
+            time.sleep(interval)
+        
+        return stacks
+    
+    @staticmethod
+    def _collapse(frame):
+        """Converte um frame em stack colapsado (raiz;...;folha)"""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+    
+    @staticmethod
+    def format_stats(stats, output, limit=50):
+        """Formata o resultado do cProfile (pstats binário ou texto)"""
+        if output == "pstats":
+            return marshal.dumps(stats.stats)
+        
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.sort_stats("cumulative").print_stats(limit)
+        return stream.getvalue()
+    
+    @staticmethod
+    def format_collapsed(stacks):
+        """Formata as amostras como stacks colapsados (flame graph)"""
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+
+
+# ========== ÍNDICES SECUNDÁRIOS ==========
+
+class FacetIndex:
+    """Índices secundários facet -> valor -> app_ids (platform, status, version)"""
+    
+    FIELDS = {"platform": "platform", "status": "status", "version": "version"}
+    
+    def __init__(self):
+        self._index = {facet: {} for facet in self.FIELDS}
+    
+    @staticmethod
+    def _key(value):
+        """Valores não-hashable (JSON livre no registro) viram string"""
+        return value if isinstance(value, (str, int, float, type(None))) else str(value)
+    
+    def add(self, app_id, app_data):
+        for facet, field in self.FIELDS.items():
+            self._index[facet].setdefault(self._key(app_data.get(field)), set()).add(app_id)
+    
+    def remove(self, app_id, app_data):
+        for facet, field in self.FIELDS.items():
+            self._discard(facet, app_data.get(field), app_id)
+    
+    def update(self, app_id, facet, old_value, new_value):
+        """Move a app de valor dentro de uma faceta"""
+        if old_value == new_value:
+            return
+        self._discard(facet, old_value, app_id)
+        self._index[facet].setdefault(self._key(new_value), set()).add(app_id)
+    
+    def _discard(self, facet, value, app_id):
+        value = self._key(value)
+        app_ids = self._index[facet].get(value)
+        if app_ids is not None:
+            app_ids.discard(app_id)
+            if not app_ids:
+                del self._index[facet][value]
+    
+    def counts(self):
+        """Contagem por valor de cada faceta (O(valores distintos))"""
+        return {facet: {str(value): len(app_ids) for value, app_ids in values.items()}
+                for facet, values in self._index.items()}
+    
+    def match(self, filters):
+        """app_ids que atendem a todos os filtros {faceta: valor}
+        
+        Interseção a partir do menor conjunto: custo proporcional ao resultado
+        do filtro mais seletivo, não ao total de apps.
+        """
+        sets = [self._index[facet].get(value, set()) for facet, value in filters.items()]
+        if not sets:
+            return set()
+        sets.sort(key=len)
+        smallest, others = sets[0], sets[1:]
+        return {app_id for app_id in smallest if all(app_id in other for other in others)}
+
+
+class NameIndex:
+    """Índice ordenado (case-insensitive) de nomes de apps para busca por prefixo"""
+    
+    def __init__(self, apps=()):
+        self._entries = sorted((self._normalize(name), app_id) for app_id, name in apps)
+    
+    @staticmethod
+    def _normalize(name):
+        return str(name).casefold()
+    
+    def add(self, app_id, name):
+        bisect.insort(self._entries, (self._normalize(name), app_id))
+    
+    def remove(self, app_id, name):
+        entry = (self._normalize(name), app_id)
+        index = bisect.bisect_left(self._entries, entry)
+        if index < len(self._entries) and self._entries[index] == entry:
+            del self._entries[index]
+    
+    def search(self, prefix, limit):
+        """app_ids cujo nome começa com o prefixo (O(log n + resultado))"""
+        prefix = self._normalize(prefix)
+        index = bisect.bisect_left(self._entries, (prefix,))
+        results = []
+        while index < len(self._entries) and len(results) < limit:
+            name, app_id = self._entries[index]
+            if not name.startswith(prefix):
+                break
+            results.append(app_id)
+            index += 1
+        return results
+    
+    def __len__(self):
+        return len(self._entries)
+
+
+# ========== FILTRO DE CREDENCIAIS ==========
+
+class CredentialFilter:
+    """Bloom filter das credenciais conhecidas (API keys e session tokens)
+    
+    Responde "definitivamente desconhecida" sem lock nem acesso ao store.
+    Remoções não limpam bits: o filtro é reconstruído quando o número de
+    itens removidos ou inseridos foge da capacidade dimensionada.
+    """
+    
+    def __init__(self, items=(), error_rate=0.001, min_capacity=1024):
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+        self._lock = threading.Lock()
+        self.rebuild(items)
+    
+    def rebuild(self, items):
+        """Reconstrói o filtro com as credenciais atuais"""
+        items = list(items)
+        capacity = max(self.min_capacity, len(items) * 2)
+        size = math.ceil(-capacity * math.log(self.error_rate) / (math.log(2) ** 2))
+        hashes = max(1, round(size / capacity * math.log(2)))
+        bits = bytearray((size + 7) // 8)
+        
+        for item in items:
+            for position in self._positions(item, size, hashes):
+                bits[position >> 3] |= 1 << (position & 7)
+        
+        with self._lock:
+            # Troca atômica: leitores concorrentes veem o filtro antigo ou o novo
+            self._state = (bits, size, hashes)
+            self.capacity = capacity
+            self.count = len(items)
+            self.removed = 0
+    
+    @staticmethod
+    def _positions(item, size, hashes):
+        digest = hashlib.blake2b(item.encode('utf-8', 'replace'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % size for i in range(hashes)]
+    
+    def add(self, item):
+        with self._lock:
+            bits, size, hashes = self._state
+            for position in self._positions(item, size, hashes):
+                bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+    
+    def discard(self, item):
+        """Contabiliza uma remoção (os bits permanecem até o rebuild)"""
+        self.removed += 1
+    
+    @property
+    def needs_rebuild(self):
+        return self.count > self.capacity or self.removed > max(self.count, self.min_capacity)
+    
+    HEADER = struct.Struct("<QQQQQ")
+    
+    def to_bytes(self):
+        """Estado serializado (o filtro do arquivo frio é persistido, não reconstruído na carga)"""
+        with self._lock:
+            bits, size, hashes = self._state
+            return self.HEADER.pack(size, hashes, self.capacity, self.count, self.removed) + bytes(bits)
+    
+    @classmethod
+    def from_bytes(cls, data, error_rate=0.001, min_capacity=1024):
+        size, hashes, capacity, count, removed = cls.HEADER.unpack_from(data)
+        bits = bytearray(data[cls.HEADER.size:])
+        if len(bits) != (size + 7) // 8:
+            raise ValueError("Filtro truncado")
+        
+        credential_filter = cls(error_rate=error_rate, min_capacity=min_capacity)
+        credential_filter._state = (bits, size, hashes)
+        credential_filter.capacity = capacity
+        credential_filter.count = count
+        credential_filter.removed = removed
+        return credential_filter
+    
+    def __contains__(self, item):
+        if not isinstance(item, str):
+            return False
+        bits, size, hashes = self._state
+        return all(bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(item, size, hashes))
+
+
+# ========== USO POR ENDPOINT ==========
+
+class PeriodicTask:
+    """Executa uma função periodicamente em uma thread daemon (intervalo <= 0 desativa)"""
+    
+    def __init__(self, name, interval, function):
+        self.name = name
+        self.interval = interval
+        self.function = function
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._started = False
+    
+    def start(self):
+        with self._lock:
+            self._started = True
+            if self._thread is None and self.interval > 0 and not self._stop.is_set():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+    
+    def set_interval(self, interval):
+        """Altera o intervalo ao vivo: <= 0 encerra a thread, um valor positivo a inicia se preciso"""
+        self.interval = interval
+        self._wake.set()
+        if self._started:
+            self.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                interval = self.interval
+                if interval <= 0:
+                    self._thread = None
+                    return
+            # Acordada por set_interval/stop: relê o intervalo antes de executar
+            if self._wake.wait(interval):
+                self._wake.clear()
+                continue
+            try:
+                self.function()
+            except Exception as e:
+                logger.error(f"Erro na tarefa periódica {self.name}: {e}")
+
+
+class EndpointUsageTracker:
+    """Top-k de endpoints por app (algoritmo Space-Saving, memória fixa por app)"""
+    
+    def __init__(self, capacity=32):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._dirty = set()
+    
+    def load(self, app_id, entries):
+        """Carrega contagens persistidas (endpoints_used) de uma app"""
+        counters = {}
+        for entry in entries or ():
+            if isinstance(entry, dict) and "endpoint" in entry:
+                counters[entry["endpoint"]] = [entry.get("count", 0), entry.get("error", 0)]
+        if counters:
+            self._counters[app_id] = dict(sorted(
+                counters.items(), key=lambda item: item[1][0], reverse=True
+            )[:self.capacity])
+    
+    def record(self, app_id, endpoint):
+        """Contabiliza um hit (O(1), ou O(k) ao substituir o mínimo)"""
+        with self._lock:
+            counters = self._counters.get(app_id)
+            if counters is None:
+                counters = self._counters[app_id] = {}
+            
+            counter = counters.get(endpoint)
+            if counter is not None:
+                counter[0] += 1
+            elif len(counters) < self.capacity:
+                counters[endpoint] = [1, 0]
+            else:
+                # Substitui o menor contador; o valor herdado vira o erro máximo
+                victim = min(counters, key=lambda name: counters[name][0])
+                floor = counters.pop(victim)[0]
+                counters[endpoint] = [floor + 1, floor]
+            self._dirty.add(app_id)
+    
+    def top(self, app_id):
+        """Endpoints da app ordenados por contagem"""
+        with self._lock:
+            counters = dict(self._counters.get(app_id, {}))
+        return [
+            {"endpoint": endpoint, "count": count, "error": error}
+            for endpoint, (count, error) in sorted(counters.items(), key=lambda item: item[1][0], reverse=True)
+        ]
+    
+    def forget(self, app_id):
+        with self._lock:
+            self._counters.pop(app_id, None)
+            self._dirty.discard(app_id)
+    
+    def drain_dirty(self):
+        """Retorna {app_id: top-k} das apps alteradas desde o último flush"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        return {app_id: self.top(app_id) for app_id in dirty}
+
+
+# ========== SÉRIES TEMPORAIS DE REQUESTS ==========
+
+class RequestRateSeries:
+    """Contagens de requests em ring buffers por segundo, minuto e hora"""
+    
+    # (nome, resolução em segundos, número de buckets)
+    RESOLUTIONS = (("per_second", 1, 60), ("per_minute", 60, 60), ("per_hour", 3600, 24))
+    
+    def __init__(self):
+        self._rings = [
+            (name, resolution, array('q', [-1]) * size, array('I', [0]) * size)
+            for name, resolution, size in self.RESOLUTIONS
+        ]
+    
+    def record(self, timestamp):
+        """Soma um request em todas as resoluções (rollup incremental)"""
+        for _, resolution, buckets, counts in self._rings:
+            bucket = int(timestamp // resolution)
+            index = bucket % len(buckets)
+            if buckets[index] != bucket:
+                buckets[index] = bucket
+                counts[index] = 0
+            counts[index] += 1
+    
+    def series(self, now):
+        """Séries da mais antiga para a mais recente, por resolução"""
+        result = {}
+        for name, resolution, buckets, counts in self._rings:
+            current = int(now // resolution)
+            first = current - len(buckets) + 1
+            result[name] = {
+                "resolution_seconds": resolution,
+                "start": first * resolution,
+                "counts": [
+                    counts[bucket % len(buckets)] if buckets[bucket % len(buckets)] == bucket else 0
+                    for bucket in range(first, current + 1)
+                ]
+            }
+        return result
+
+
+class RequestRateTracker:
+    """Séries de requests por app (memória fixa por app)"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+    
+    def record(self, app_id, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            series = self._series.get(app_id)
+            if series is None:
+                series = self._series[app_id] = RequestRateSeries()
+            series.record(timestamp)
+    
+    def series(self, app_id, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            series = self._series.get(app_id)
+            return series.series(now) if series is not None else RequestRateSeries().series(now)
+    
+    def forget(self, app_id):
+        with self._lock:
+            self._series.pop(app_id, None)
+
+
+# ========== VALIDAÇÃO DE REQUESTS ==========
+
+class RejectionCounters:
+    """Requests recusados na validação, por rota e motivo"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+    
+    def add(self, route, reason):
+        with self._lock:
+            self._counts[(route, reason)] += 1
+    
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        result = {}
+        for (route, reason), count in sorted(counts.items()):
+            result.setdefault(route, {})[reason] = count
+        return result
+
+
+class RequestSchema:
+    """Corpo JSON esperado por uma rota, pré-compilado
+    
+    O limite de tamanho é verificado antes de ler/parsear o corpo e as respostas de erro
+    já ficam serializadas: lixo é recusado sem exceção, log ou jsonify.
+    """
+    
+    def __init__(self, route, fields, max_body_bytes, counters, messages=None):
+        self.route = route
+        self.max_body_bytes = max_body_bytes
+        self.counters = counters
+        messages = messages or {}
+        
+        # fields: {campo: (obrigatório, tamanho máximo)}; todos os campos são texto
+        self._checks = tuple(
+            (name, required, max_length,
+             self._error(messages.get(name, f"Campo obrigatório: {name}")),
+             self._error(f"Campo inválido: {name}"))
+            for name, (required, max_length) in fields.items()
+        )
+        self._invalid_json = self._error("JSON inválido")
+        self._not_object = self._error("Corpo deve ser um objeto JSON")
+    
+    @staticmethod
+    def _error(message):
+        return json.dumps({"error": message}, ensure_ascii=False).encode("utf-8")
+    
+    def _reject(self, reason, body, status=400):
+        self.counters.add(self.route, reason)
+        return None, Flask.response_class(body, status=status, mimetype="application/json")
+    
+    def parse(self, req):
+        """Retorna (dados, None) ou (None, resposta de erro)"""
+        length = req.content_length
+        if length is not None and length > self.max_body_bytes:
+            return self._reject("body_too_large", self._error(
+                f"Corpo excede o limite de {self.max_body_bytes} bytes"), 413)
+        
+        # Sem Content-Length (chunked): lê no máximo um byte além do limite
+        raw = req.get_data(cache=True) if length is not None else req.stream.read(self.max_body_bytes + 1)
+        if len(raw) > self.max_body_bytes:
+            return self._reject("body_too_large", self._error(
+                f"Corpo excede o limite de {self.max_body_bytes} bytes"), 413)
+        
+        try:
+            data = json.loads(raw)
+        except (ValueError, RecursionError):
+            return self._reject("invalid_json", self._invalid_json)
+        if not isinstance(data, dict):
+            return self._reject("not_object", self._not_object)
+        
+        for name, required, max_length, missing, invalid in self._checks:
+            value = data.get(name)
+            if value is None:
+                if required:
+                    return self._reject("missing_field", missing)
+                continue
+            if not isinstance(value, str) or len(value) > max_length or (required and not value.strip()):
+                return self._reject("invalid_field", invalid)
+        return data, None
+
+
+# ========== REQUISIÇÕES ASSINADAS ==========
+
+class ReplayGuard:
+    """Assinaturas já vistas dentro da janela de validade (memória limitada)"""
+    
+    def __init__(self, window, max_entries=100000):
+        self.window = window
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._seen = {}
+    
+    def check_and_add(self, signature, now):
+        """False se a assinatura já foi usada (replay)"""
+        with self._lock:
+            # dict mantém ordem de inserção: as entradas mais antigas vêm primeiro
+            while self._seen:
+                oldest = next(iter(self._seen))
+                if self._seen[oldest] > now and len(self._seen) < self.max_entries:
+                    break
+                del self._seen[oldest]
+            
+            if signature in self._seen:
+                return False
+            self._seen[signature] = now + 2 * self.window
+            return True
+
+
+class RequestSigner:
+    """Verifica requests assinados com o secret da API key (HMAC-SHA256)
+    
+    Mensagem assinada: METHOD\\nPATH\\nTIMESTAMP\\nSHA256(body) em hex.
+    """
+    
+    HEX_DIGITS = frozenset("0123456789abcdef")
+    
+    def __init__(self, window=300):
+        self.window = window
+        self.replay_guard = ReplayGuard(window)
+        self._contexts = {}
+    
+    def set_window(self, window):
+        self.window = window
+        self.replay_guard.window = window
+    
+    @staticmethod
+    def canonical(method, path, timestamp, body):
+        return f"{method.upper()}\n{path}\n{timestamp}\n{hashlib.sha256(body).hexdigest()}"
+    
+    @classmethod
+    def sign(cls, secret, method, path, timestamp, body=b""):
+        """Assinatura de referência (usada pelos clientes)"""
+        message = cls.canonical(method, path, timestamp, body)
+        return hmac.new(secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+    
+    def forget(self, api_key):
+        self._contexts.pop(api_key, None)
+    
+    def verify(self, api_key, secret, method, path, timestamp, body, signature):
+        """Retorna None se válido, ou a mensagem de erro"""
+        # Só hex minúsculo de 64 caracteres pode coincidir (e compare_digest rejeita str não-ASCII)
+        if not isinstance(signature, str) or len(signature) != 64 or not self.HEX_DIGITS.issuperset(signature):
+            return "Assinatura inválida"
+        try:
+            timestamp_value = int(timestamp)
+        except (TypeError, ValueError):
+            return "Timestamp inválido"
+        
+        now = time.time()
+        if abs(now - timestamp_value) > self.window:
+            return "Timestamp fora da janela permitida"
+        
+        # Contexto HMAC com a chave já processada, copiado a cada request
+        context = self._contexts.get(api_key)
+        if context is None:
+            context = self._contexts[api_key] = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+        context = context.copy()
+        context.update(self.canonical(method, path, timestamp, body).encode())
+        
+        if not hmac.compare_digest(context.hexdigest(), signature):
+            return "Assinatura inválida"
+        if not self.replay_guard.check_and_add(signature, now):
+            return "Assinatura já utilizada"
+        return None
+
+
+# ========== EVENTOS DE APPS (SSE) ==========
+
+class EventSubscription:
+    """Assinante do barramento de eventos com buffer limitado"""
+    
+    def __init__(self, buffer_size):
+        self._events = deque()
+        self._buffer_size = buffer_size
+        self._cond = threading.Condition()
+        self.overflowed = False
+        self.closed = False
+    
+    def push(self, event):
+        """Enfileira um evento (marca overflow se o consumidor está atrasado)"""
+        with self._cond:
+            if len(self._events) >= self._buffer_size:
+                self.overflowed = True
+            else:
+                self._events.append(event)
+            self._cond.notify()
+    
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+    
+    def next_batch(self, timeout):
+        """Aguarda e retorna os eventos pendentes ([] em caso de timeout)"""
+        with self._cond:
+            if not self._events and not self.overflowed and not self.closed:
+                self._cond.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+
+class AppEventBus:
+    """Barramento de eventos de apps com histórico para retomada (Last-Event-ID)"""
+    
+    def __init__(self, history_size=1000, subscriber_buffer=256):
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=history_size)
+        self._subscriber_buffer = subscriber_buffer
+        self._subscribers = set()
+        self._next_id = 1
+    
+    def publish(self, event_type, payload):
+        """Publica um evento para todos os assinantes"""
+        with self._lock:
+            event = {"id": self._next_id, "event": event_type, "data": payload}
+            self._next_id += 1
+            self._history.append(event)
+            for subscription in self._subscribers:
+                subscription.push(event)
+    
+    def subscribe(self, last_event_id=None):
+        """Cria um assinante, reenviando os eventos após last_event_id
+        
+        Retorna (assinante, completo) - completo é False quando parte dos
+        eventos desde last_event_id já saiu do histórico
+        """
+        subscription = EventSubscription(self._subscriber_buffer)
+        complete = True
+        
+        with self._lock:
+            if last_event_id is not None:
+                missed = [event for event in self._history if event["id"] > last_event_id]
+                oldest = self._history[0]["id"] if self._history else self._next_id
+                complete = (oldest - 1 <= last_event_id < self._next_id
+                            and len(missed) <= self._subscriber_buffer)
+                for event in missed[-self._subscriber_buffer:]:
+                    subscription.push(event)
+            self._subscribers.add(subscription)
+        
+        return subscription, complete
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+        subscription.close()
+    
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+    
+    def close_all(self):
+        """Encerra todos os streams abertos (retorna quantos foram fechados)"""
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, set()
+        for subscription in subscribers:
+            subscription.close()
+        return len(subscribers)
+
+
+# ========== PRESENÇA (HEARTBEAT) ==========
+
+class PresenceTracker:
+    """Presença das apps por heartbeat, com expiração via timing wheel
+    
+    O heartbeat só atualiza o last-seen em memória. Cada app fica agendada em
+    um slot da roda; quando o slot vence, o prazo real é recalculado a partir
+    do last-seen (reagendando se houve heartbeat) e apenas as transições
+    connected -> stale -> offline são repassadas ao callback.
+    """
+    
+    def __init__(self, on_transitions, stale_after=120, offline_after=600, tick=1.0):
+        self._on_transitions = on_transitions
+        self.stale_after = stale_after
+        self.offline_after = max(offline_after, stale_after)
+        self.tick = tick
+        
+        self._lock = threading.Lock()
+        self._slots = [set() for _ in range(int(self.offline_after / tick) + 2)]
+        self._due_tick = {}
+        self._last_seen = {}
+        self._state = {}
+        self._origin = time.monotonic()
+        self._processed_tick = 0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _tick_at(self, timestamp):
+        return int((timestamp - self._origin) / self.tick)
+    
+    def _schedule(self, app_id, due):
+        """Agenda a app no slot do prazo (chamado sob o lock)"""
+        due_tick = max(self._tick_at(due) + 1, self._processed_tick + 1)
+        self._due_tick[app_id] = due_tick
+        self._slots[due_tick % len(self._slots)].add(app_id)
+    
+    def beat(self, app_id):
+        """Registra um heartbeat; retorna True se a app voltou de stale/offline"""
+        now = time.monotonic()
+        with self._lock:
+            self._last_seen[app_id] = now
+            previous = self._state.get(app_id)
+            self._state[app_id] = "connected"
+            if app_id not in self._due_tick:
+                self._schedule(app_id, now + self.stale_after)
+        
+        if previous in ("stale", "offline"):
+            self._on_transitions([(app_id, "connected")])
+            return True
+        return False
+    
+    def forget(self, app_id):
+        """Deixa de acompanhar a app (ex.: desconexão explícita)"""
+        with self._lock:
+            due_tick = self._due_tick.pop(app_id, None)
+            if due_tick is not None:
+                self._slots[due_tick % len(self._slots)].discard(app_id)
+            self._last_seen.pop(app_id, None)
+            self._state.pop(app_id, None)
+    
+    def last_seen(self, app_id):
+        """Segundos desde o último heartbeat (None se não acompanhada)"""
+        seen = self._last_seen.get(app_id)
+        return None if seen is None else time.monotonic() - seen
+    
+    def advance(self, now=None):
+        """Processa os slots vencidos até agora e repassa as transições"""
+        now = time.monotonic() if now is None else now
+        transitions = []
+        
+        with self._lock:
+            current_tick = self._tick_at(now)
+            while self._processed_tick < current_tick:
+                self._processed_tick += 1
+                slot = self._slots[self._processed_tick % len(self._slots)]
+                for app_id in list(slot):
+                    if self._due_tick.get(app_id) != self._processed_tick:
+                        continue
+                    slot.discard(app_id)
+                    del self._due_tick[app_id]
+                    self._expire(app_id, now, transitions)
+        
+        if transitions:
+            self._on_transitions(transitions)
+        return transitions
+    
+    def _expire(self, app_id, now, transitions):
+        """Recalcula o prazo da app a partir do last-seen (chamado sob o lock)"""
+        silence = now - self._last_seen[app_id]
+        state = self._state[app_id]
+        
+        if state == "connected" and silence >= self.stale_after:
+            state = self._state[app_id] = "stale"
+            transitions.append((app_id, "stale"))
+        
+        if state == "stale" and silence >= self.offline_after:
+            # Offline: sai da roda, mas mantém o estado para detectar o retorno
+            transitions.append((app_id, "offline"))
+            self._state[app_id] = "offline"
+            return
+        
+        window = self.stale_after if state == "connected" else self.offline_after
+        self._schedule(app_id, self._last_seen[app_id] + window)
+    
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="presence-tracker", daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            try:
+                self.advance()
+            except Exception as e:
+                logger.error(f"Erro no rastreador de presença: {e}")
+
+
+# ========== REPLICAÇÃO (LEADER -> FOLLOWERS) ==========
+
+class ReplicationLog:
+    """Log de alterações dos stores com números de sequência (memória limitada)
+    
+    Cada entrada é serializada uma única vez (linha JSON) e compartilhada por
+    todos os followers. O epoch muda a cada início do leader.
+    """
+    
+    def __init__(self, max_entries=100000):
+        self.epoch = uuid.uuid4().hex
+        self.head = 0
+        self._entries = deque(maxlen=max_entries)
+        self._cond = threading.Condition()
+    
+    def append(self, store, key, value):
+        with self._cond:
+            self.head += 1
+            line = json.dumps({
+                "type": "entry",
+                "seq": self.head,
+                "store": store,
+                "key": key,
+                "value": value,
+                "ts": time.time()
+            }, ensure_ascii=False)
+            self._entries.append((self.head, line))
+            self._cond.notify_all()
+    
+    def covers(self, seq):
+        """True se todas as entradas após seq ainda estão no log"""
+        with self._cond:
+            first = self._entries[0][0] if self._entries else self.head + 1
+            return first - 1 <= seq <= self.head
+    
+    def since(self, seq, timeout):
+        """Linhas após seq (aguarda até timeout); None se já saíram do log"""
+        with self._cond:
+            if self.head <= seq:
+                self._cond.wait(timeout)
+            if self.head <= seq:
+                return []
+            first = self._entries[0][0] if self._entries else self.head + 1
+            if seq < first - 1:
+                return None
+            return [line for entry_seq, line in itertools.islice(self._entries, seq - first + 1, None)]
+
+
+def replication_auth(token, nonce):
+    """Resposta ao desafio do leader: HMAC-SHA256 do nonce com o token compartilhado"""
+    return hmac.new(token.encode(), nonce.encode(), hashlib.sha256).hexdigest()
+
+
+class ReplicationLeader:
+    """Envia o log de alterações aos followers via TCP (linhas JSON)
+    
+    Cada conexão começa com um desafio (nonce); o follower só recebe dados
+    se responder com o HMAC do nonce usando o token de replicação.
+    """
+    
+    def __init__(self, manager, bind, token, max_entries=100000, heartbeat=1.0, handshake_timeout=10.0):
+        self.manager = manager
+        self.bind = bind
+        self.token = token
+        self.heartbeat = heartbeat
+        self.handshake_timeout = handshake_timeout
+        self.log = ReplicationLog(max_entries)
+        self.followers = {}
+        self._server = None
+        manager.replication_log = self.log
+    
+    def start(self):
+        host, port = self.bind.rsplit(":", 1)
+        leader = self
+        
+        class FollowerHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                leader._serve_follower(self.request, self.client_address)
+        
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer((host, int(port)), FollowerHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="replication-leader", daemon=True).start()
+        logger.info(f"🛰️ Replicação: leader ouvindo em {self.bind}")
+    
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+    
+    def _snapshot(self):
+        """Snapshot consistente dos stores + seq correspondente do log"""
+        with self.manager._lock:
+            return self.log.head, json.dumps({
+                "type": "snapshot",
+                "epoch": self.log.epoch,
+                "seq": self.log.head,
+                "apps": self.manager.connected_apps,
+                "api_keys": self.manager.api_keys,
+                "sessions": self.manager.active_sessions
+            }, ensure_ascii=False)
+    
+    def _serve_follower(self, sock, address):
+        follower_id = f"{address[0]}:{address[1]}"
+        reader = sock.makefile('r', encoding='utf-8')
+        
+        try:
+            nonce = uuid.uuid4().hex
+            sock.settimeout(self.handshake_timeout)
+            sock.sendall((json.dumps({"type": "challenge", "nonce": nonce}) + "\n").encode())
+            hello = json.loads(reader.readline() or "{}")
+            if not isinstance(hello, dict) or not hmac.compare_digest(
+                    str(hello.get("auth", "")).encode(), replication_auth(self.token, nonce).encode()):
+                logger.warning(f"🛰️ Follower recusado: {follower_id} (autenticação inválida)")
+                sock.sendall((json.dumps({"type": "error", "message": "Autenticação de replicação inválida"}) + "\n").encode())
+                return
+            sock.settimeout(None)
+            seq = hello.get("last_seq", 0)
+            
+            if hello.get("epoch") == self.log.epoch and self.log.covers(seq):
+                sock.sendall((json.dumps({"type": "welcome", "epoch": self.log.epoch, "seq": seq}) + "\n").encode())
+            else:
+                seq, snapshot = self._snapshot()
+                sock.sendall((snapshot + "\n").encode())
+            
+            state = self.followers[follower_id] = {
+                "node": hello.get("node"),
+                "sent_seq": seq,
+                "acked_seq": seq,
+                "last_ack": time.time()
+            }
+            logger.info(f"🛰️ Follower conectado: {follower_id} (seq {seq})")
+            
+            def read_acks():
+                for line in reader:
+                    message = json.loads(line)
+                    if message.get("type") == "ack":
+                        state["acked_seq"] = message["seq"]
+                        state["last_ack"] = time.time()
+            
+            threading.Thread(target=read_acks, name=f"replication-acks-{follower_id}", daemon=True).start()
+            
+            while True:
+                lines = self.log.since(seq, self.heartbeat)
+                if lines is None:
+                    # Follower ficou para trás do log: reenviar snapshot
+                    seq, snapshot = self._snapshot()
+                    lines = [snapshot]
+                elif lines:
+                    seq += len(lines)
+                else:
+                    lines = [json.dumps({"type": "heartbeat", "head": self.log.head, "ts": time.time()})]
+                
+                sock.sendall(("\n".join(lines) + "\n").encode())
+                state["sent_seq"] = seq
+        except (OSError, ValueError) as e:
+            logger.warning(f"🛰️ Follower desconectado: {follower_id} ({e})")
+        finally:
+            self.followers.pop(follower_id, None)
+            sock.close()
+    
+    def status(self):
+        now = time.time()
+        return {
+            "role": "leader",
+            "epoch": self.log.epoch,
+            "head": self.log.head,
+            "followers": [
+                {
+                    "address": follower_id,
+                    "node": state["node"],
+                    "acked_seq": state["acked_seq"],
+                    "lag_entries": self.log.head - state["acked_seq"],
+                    "last_ack_seconds": round(now - state["last_ack"], 3)
+                }
+                for follower_id, state in list(self.followers.items())
+            ]
+        }
+
+
+class ReplicationFollower:
+    """Aplica localmente o log do leader; leituras são atendidas pela réplica"""
+    
+    def __init__(self, manager, leader_address, leader_url, token, node=None):
+        self.manager = manager
+        self.leader_address = leader_address
+        self.token = token
+        self.leader_url = leader_url.rstrip('/')
+        self.node = node or socket.gethostname()
+        self.epoch = None
+        self.applied_seq = 0
+        self.leader_head = 0
+        self.connected = False
+        self.last_contact = None
+        self.last_entry_delay = 0.0
+        self.http = requests.Session()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+    
+    def start(self):
+        threading.Thread(target=self._run, name="replication-follower", daemon=True).start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        backoff = 0.5
+        while not self._stop.is_set():
+            try:
+                self._follow()
+                backoff = 0.5
+            except (OSError, ValueError) as e:
+                logger.warning(f"🛰️ Conexão com o leader perdida: {e}")
+            except Exception as e:
+                logger.error(f"🛰️ Erro aplicando replicação: {e}", exc_info=True)
+            self.connected = False
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 10)
+    
+    def _follow(self):
+        host, port = self.leader_address.rsplit(":", 1)
+        with socket.create_connection((host, int(port)), timeout=30) as sock:
+            reader = sock.makefile('r', encoding='utf-8')
+            challenge = json.loads(reader.readline() or "{}")
+            if challenge.get("type") != "challenge":
+                raise ValueError("leader não enviou o desafio de autenticação")
+            hello = {
+                "type": "hello",
+                "node": self.node,
+                "epoch": self.epoch,
+                "last_seq": self.applied_seq,
+                "auth": replication_auth(self.token, challenge["nonce"])
+            }
+            sock.sendall((json.dumps(hello) + "\n").encode())
+            self.connected = True
+            logger.info(f"🛰️ Conectado ao leader {self.leader_address}")
+            
+            for line in reader:
+                message = json.loads(line)
+                self.last_contact = time.time()
+                kind = message["type"]
+                
+                if kind == "error":
+                    raise ValueError(message.get("message", "conexão recusada pelo leader"))
+                elif kind == "snapshot":
+                    self.manager.load_replicated_snapshot(message["apps"], message["api_keys"], message["sessions"])
+                    self.epoch = message["epoch"]
+                    self._applied(message["seq"])
+                    self.leader_head = max(self.leader_head, message["seq"])
+                    logger.info(f"🛰️ Snapshot aplicado (seq {message['seq']})")
+                elif kind == "welcome":
+                    self.epoch = message["epoch"]
+                elif kind == "entry":
+                    self.manager.apply_replicated(message["store"], message["key"], message["value"])
+                    self.leader_head = max(self.leader_head, message["seq"])
+                    self.last_entry_delay = max(0.0, time.time() - message["ts"])
+                    self._applied(message["seq"])
+                elif kind == "heartbeat":
+                    self.leader_head = message["head"]
+                    sock.sendall((json.dumps({"type": "ack", "seq": self.applied_seq}) + "\n").encode())
+                
+                if self._stop.is_set():
+                    break
+    
+    def _applied(self, seq):
+        with self._cond:
+            self.applied_seq = seq
+            self._cond.notify_all()
+    
+    def wait_for(self, seq, timeout):
+        """Aguarda a réplica aplicar até seq (leitura das próprias escritas)"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.applied_seq < seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+    
+    def status(self):
+        return {
+            "role": "follower",
+            "leader": self.leader_address,
+            "connected": self.connected,
+            "epoch": self.epoch,
+            "applied_seq": self.applied_seq,
+            "leader_head": self.leader_head,
+            "lag_entries": max(0, self.leader_head - self.applied_seq),
+            "last_entry_delay_seconds": round(self.last_entry_delay, 3),
+            "last_contact_seconds": round(time.time() - self.last_contact, 3) if self.last_contact else None
+        }
+
+
+# ========== ENCERRAMENTO GRACIOSO ==========
+
+class ShutdownCoordinator:
+    """Encerramento: para de aceitar conexões, drena requests e executa as etapas de flush
+    
+    Cada etapa retorna o que gravou; o relatório final reúne drenagem e etapas.
+    """
+    
+    def __init__(self, inflight, drain_timeout=8.0):
+        self.inflight = inflight
+        self.drain_timeout = drain_timeout
+        self.stop_accepting = None
+        self.report = None
+        self._steps = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._done = threading.Event()
+    
+    def add_step(self, name, function):
+        """Registra uma etapa de flush (executadas na ordem de registro)"""
+        self._steps.append((name, function))
+    
+    def install_signal_handlers(self):
+        """SIGTERM/SIGINT disparam o encerramento fora do handler (thread própria)"""
+        def handle(signum, frame):
+            reason = signal.Signals(signum).name
+            threading.Thread(target=self.shutdown, args=(reason,), name="shutdown", daemon=True).start()
+        
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, handle)
+    
+    def shutdown(self, reason):
+        """Executa o encerramento uma única vez (chamadas seguintes aguardam o primeiro)"""
+        with self._lock:
+            if self._started:
+                self._done.wait()
+                return self.report
+            self._started = True
+        
+        started = time.monotonic()
+        logger.info(f"🛑 Encerrando ({reason}): parando de aceitar conexões")
+        if self.stop_accepting is not None:
+            self.stop_accepting()
+        
+        drain = self._drain()
+        steps = self._flush()
+        self.report = {
+            "reason": reason,
+            "drain": drain,
+            "steps": steps,
+            "seconds": round(time.monotonic() - started, 3)
+        }
+        
+        logger.info(f"📋 Encerramento concluído em {self.report['seconds']}s: {json.dumps(self.report, ensure_ascii=False)}")
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+        self._done.set()
+        return self.report
+    
+    def _drain(self):
+        """Aguarda os requests em andamento até o prazo"""
+        started = time.monotonic()
+        deadline = started + self.drain_timeout
+        pending = self.inflight.snapshot()
+        initial = len(pending)
+        if initial:
+            logger.info(f"⏳ Drenando {initial} requests em andamento (prazo {self.drain_timeout}s)")
+        
+        while pending and time.monotonic() < deadline:
+            time.sleep(0.05)
+            pending = self.inflight.snapshot()
+        
+        if pending:
+            logger.warning(f"⚠️ {len(pending)} requests abandonados no prazo de drenagem")
+        return {
+            "in_flight": initial,
+            "completed": initial - len(pending),
+            "abandoned": sorted(info["route"] for info in pending.values()),
+            "seconds": round(time.monotonic() - started, 3)
+        }
+    
+    def _flush(self):
+        results = {}
+        for name, function in self._steps:
+            started = time.perf_counter()
+            try:
+                results[name] = {"flushed": function()}
+            except Exception as e:
+                logger.error(f"❌ Falha na etapa de encerramento {name}: {e}")
+                results[name] = {"error": str(e)}
+            results[name]["ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return results
+    
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+    
+    @property
+    def failed(self):
+        return self.report is not None and any("error" in step for step in self.report["steps"].values())
+
+
+# ========== ARQUIVO FRIO ==========
+
+class ColdArchive:
+    """Apps inativas fora dos stores quentes: shards gzip escolhidos pelo hash da API key
+    
+    Um Bloom filter persistido das keys arquivadas responde "não arquivada" sem
+    abrir shards, e a carga do servidor não lê o arquivo.
+    """
+    
+    def __init__(self, directory, shards=64):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._state_path = os.path.join(directory, "state.json")
+        self._filter_path = os.path.join(directory, "keys.bloom")
+        os.makedirs(directory, exist_ok=True)
+        
+        self.shards = shards
+        self.archived = 0
+        self.filter = None
+        if os.path.exists(self._state_path):
+            try:
+                with open(self._state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                # O número de shards define onde cada key está: o do disco prevalece
+                self.shards = state["shards"]
+                self.archived = state["archived"]
+                with open(self._filter_path, 'rb') as f:
+                    self.filter = CredentialFilter.from_bytes(f.read())
+            except Exception as e:
+                logger.error(f"❄️ Estado do arquivo frio inválido, reconstruindo: {e}")
+        if self.shards != shards:
+            logger.warning(f"❄️ Arquivo frio mantém {self.shards} shards (configurado: {shards})")
+        if self.filter is None:
+            with self._locked():
+                self._rebuild_filter()
+                self._save_state()
+    
+    @contextmanager
+    def _locked(self):
+        """Lock das threads e flock do diretório (workers do Gunicorn compartilham o arquivo)"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.directory, "LOCK"), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+    
+    def _shard_path(self, api_key):
+        index = int.from_bytes(hashlib.sha1(api_key.encode('utf-8')).digest()[:4], 'little') % self.shards
+        return os.path.join(self.directory, f"shard-{index:03d}.json.gz")
+    
+    def _read_shard(self, path):
+        try:
+            with gzip.open(path, 'rb') as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return {}
+    
+    def _write_shard(self, path, entries):
+        if not entries:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        temp_path = f"{path}.tmp"
+        with gzip.open(temp_path, 'wb') as f:
+            # dumps (encoder em C) e uma única escrita: json.dump em stream gzip é dezenas de vezes mais lento
+            f.write(json.dumps(entries, ensure_ascii=False, separators=(",", ":")).encode('utf-8'))
+        os.replace(temp_path, path)
+    
+    def _shard_paths(self):
+        return [os.path.join(self.directory, name) for name in sorted(os.listdir(self.directory))
+                if name.startswith("shard-") and name.endswith(".json.gz")]
+    
+    def _rebuild_filter(self):
+        """Relê todos os shards (só quando o filtro falta ou sai da capacidade)"""
+        keys = [api_key for path in self._shard_paths() for api_key in self._read_shard(path)]
+        self.filter = CredentialFilter(keys)
+        self.archived = len(keys)
+    
+    def _save_state(self):
+        for path, data in ((self._filter_path, self.filter.to_bytes()),
+                           (self._state_path, json.dumps({"shards": self.shards, "archived": self.archived}).encode())):
+            with open(f"{path}.tmp", 'wb') as f:
+                f.write(data)
+            os.replace(f"{path}.tmp", path)
+    
+    def put(self, entries):
+        """Arquiva {api_key: {"app_id", "app", "api_keys"}} (um rewrite por shard)"""
+        by_shard = {}
+        for api_key, entry in entries.items():
+            by_shard.setdefault(self._shard_path(api_key), {})[api_key] = entry
+        
+        with self._locked():
+            for path, shard_entries in by_shard.items():
+                shard = self._read_shard(path)
+                self.archived += sum(1 for api_key in shard_entries if api_key not in shard)
+                shard.update(shard_entries)
+                self._write_shard(path, shard)
+            for api_key in entries:
+                self.filter.add(api_key)
+            if self.filter.needs_rebuild:
+                self._rebuild_filter()
+            self._save_state()
+    
+    def might_contain(self, api_key):
+        """False se a key definitivamente não está arquivada (sem lock nem disco)"""
+        return api_key in self.filter
+    
+    def get(self, api_key):
+        """Entrada arquivada da key (None se não arquivada)"""
+        if api_key not in self.filter:
+            return None
+        with self._locked():
+            return self._read_shard(self._shard_path(api_key)).get(api_key)
+    
+    def remove(self, api_key):
+        with self._locked():
+            path = self._shard_path(api_key)
+            shard = self._read_shard(path)
+            if shard.pop(api_key, None) is None:
+                return False
+            self._write_shard(path, shard)
+            self.archived -= 1
+            self.filter.discard(api_key)
+            if self.filter.needs_rebuild:
+                self._rebuild_filter()
+            self._save_state()
+        return True
+    
+    def stats(self):
+        paths = self._shard_paths()
+        return {
+            "archived_apps": self.archived,
+            "shards": self.shards,
+            "shard_files": len(paths),
+            "bytes": sum(os.path.getsize(path) for path in paths)
+        }
+
+
 class AppConnectionManager:
     """Gerenciador de conexões de aplicativos"""
     
-    def __init__(self):
-        self.apps_file = "config/connected_apps.json"
-        self.api_keys_file = "config/api_keys.json"
-        self.sessions_file = "config/active_sessions.json"
+    REQUIRED_APP_FIELDS = ('app_name', 'app_version', 'platform')
+    
+    SESSION_LIMIT_ERROR = "Limite de sessões simultâneas atingido"
+    
+    def __init__(self, session_duration_hours=24, max_sessions_per_app=0, credential_filter=True,
+                 signature_window=300, data_dir="config", persist=True):
+        self.apps_file = os.path.join(data_dir, "connected_apps.json")
+        self.api_keys_file = os.path.join(data_dir, "api_keys.json")
+        self.sessions_file = os.path.join(data_dir, "active_sessions.json")
+        
+        # Servidor roda com threaded=True: mutações e gravações sob o mesmo lock
+        self._lock = threading.RLock()
+        self.session_duration_hours = session_duration_hours
+        self.max_sessions_per_app = max_sessions_per_app
+        self._listeners = []
+        self.signer = RequestSigner(signature_window)
+        
+        # Réplicas (followers) não gravam em disco: o estado vem do leader
+        self.persist = persist
+        
+        # Log de replicação (definido pelo leader) e chaves alteradas por store
+        self.replication_log = None
+        self._pending_changes = {"apps": set(), "api_keys": set(), "sessions": set()}
         
         # Garantir que as pastas existem
-        os.makedirs("config", exist_ok=True)
+        os.makedirs(data_dir, exist_ok=True)
         os.makedirs("logs", exist_ok=True)
         
         self.connected_apps = self._load_apps()
         self.api_keys = self._load_api_keys()
         self.active_sessions = self._load_sessions()
         
+        # Rejeição rápida de credenciais desconhecidas (None = desativado)
+        self.credential_filter_enabled = credential_filter
+        self.credential_filter = None
+        self.rejected_credentials = 0
+        
+        # Atrás do proxy: credenciais só são emitidas se o anel as roteia a este worker
+        self.credential_owner = None
+        
+        # Arquivo frio de apps inativas (ColdArchive; definido pelo servidor)
+        self.archive = None
+        
+        self._rebuild_indexes()
+    
+    def _rebuild_indexes(self):
+        """Reconstrói todos os índices em memória a partir dos stores"""
+        # Índice api_key -> app_id (evita varrer connected_apps no connect)
+        self._app_by_key = {app_data["api_key"]: app_id for app_id, app_data in self.connected_apps.items()}
+        
+        # Índices secundários por platform/status/version
+        self.facets = FacetIndex()
+        for app_id, app_data in self.connected_apps.items():
+            self.facets.add(app_id, app_data)
+        
+        # Índice ordenado de nomes para busca por prefixo
+        self.names = NameIndex((app_id, app_data["name"]) for app_id, app_data in self.connected_apps.items())
+        
+        # Índice app_id -> tokens de sessão (evita varrer active_sessions)
+        self._sessions_by_app = {}
+        for session_token, session in self.active_sessions.items():
+            self._sessions_by_app.setdefault(session["app_id"], set()).add(session_token)
+        
+        if self.credential_filter_enabled:
+            self.credential_filter = CredentialFilter(self._known_credentials())
+    
+    def _changed(self, store, key):
+        """Marca uma chave alterada para o log de replicação"""
+        if self.replication_log is not None:
+            self._pending_changes[store].add(key)
+    
+    def _publish_changes(self, store):
+        """Envia ao log de replicação as chaves alteradas do store (na gravação)"""
+        pending = self._pending_changes[store]
+        if self.replication_log is None or not pending:
+            return
+        
+        source = self._store(store)
+        for key in pending:
+            self.replication_log.append(store, key, source.get(key))
+        pending.clear()
+    
+    def _store(self, store):
+        """Dicionário do store pelo nome usado na replicação/exportação"""
+        return {"apps": self.connected_apps, "api_keys": self.api_keys, "sessions": self.active_sessions}[store]
+    
     def _load_apps(self):
         """Carrega apps conectadas"""
         if os.path.exists(self.apps_file):
@@ -53,8 +1748,122 @@ class AppConnectionManager:
                 logger.error(f"Erro ao carregar apps: {e}")
         return {}
     
+    def _known_credentials(self):
+        """API keys e session tokens atuais (fonte do filtro)"""
+        yield from list(self.api_keys)
+        yield from list(self.active_sessions)
+    
+    def is_known_credential(self, credential):
+        """False apenas se a credencial é definitivamente desconhecida (sem lock)"""
+        if self.credential_filter is None or credential in self.credential_filter:
+            return True
+        # API key de app arquivada: reidratada no connect
+        if self.archive is not None and self.archive.might_contain(credential):
+            return True
+        self.rejected_credentials += 1
+        return False
+    
+    def _new_credential(self, prefix):
+        """Gera uma API key ou token de sessão (pertencente a este worker, se houver anel)"""
+        while True:
+            credential = f"{prefix}_{uuid.uuid4().hex}"
+            if self.credential_owner is None or self.credential_owner(credential):
+                return credential
+    
+    def _track_credential(self, credential):
+        """Chamado com a credencial já no store (o rebuild parte dos stores)"""
+        if self.credential_filter is not None:
+            self.credential_filter.add(credential)
+            if self.credential_filter.needs_rebuild:
+                self.credential_filter.rebuild(self._known_credentials())
+    
+    def _untrack_credential(self, credential):
+        if self.credential_filter is not None:
+            self.credential_filter.discard(credential)
+            if self.credential_filter.needs_rebuild:
+                self.credential_filter.rebuild(self._known_credentials())
+    
+    @synchronized
+    def load_replicated_snapshot(self, apps, api_keys, sessions):
+        """Substitui os stores pelo snapshot do leader (follower)"""
+        self.connected_apps = apps
+        self.api_keys = api_keys
+        self.active_sessions = sessions
+        self._rebuild_indexes()
+    
+    @synchronized
+    def apply_replicated(self, store, key, value):
+        """Aplica uma entrada do log do leader mantendo os índices (follower)"""
+        self._apply_entry(store, key, value)
+    
+    def _apply_entry(self, store, key, value, emit=True):
+        """Substitui (ou remove, com value None) uma chave de um store mantendo os índices"""
+        if store == "apps":
+            previous = self.connected_apps.pop(key, None)
+            if previous is not None:
+                self.facets.remove(key, previous)
+                self.names.remove(key, previous["name"])
+                self._app_by_key.pop(previous["api_key"], None)
+            if value is None:
+                return
+            
+            self.connected_apps[key] = value
+            self.facets.add(key, value)
+            self.names.add(key, value["name"])
+            self._app_by_key[value["api_key"]] = key
+            
+            if not emit:
+                return
+            if previous is None:
+                self._emit("registered", key, value["name"], platform=value.get("platform"), version=value.get("version"))
+            elif previous.get("status") != value.get("status"):
+                self._emit(value["status"], key, value["name"])
+        
+        elif store == "api_keys":
+            if value is None:
+                if self.api_keys.pop(key, None) is not None:
+                    self._untrack_credential(key)
+            else:
+                is_new = key not in self.api_keys
+                self.api_keys[key] = value
+                if is_new:
+                    self._track_credential(key)
+        
+        elif store == "sessions":
+            if key in self.active_sessions:
+                self._remove_session(key)
+            if value is not None:
+                self._add_session(key, value)
+    
+    def add_listener(self, listener):
+        """Registra um callback listener(event_type, payload) para eventos de apps"""
+        self._listeners.append(listener)
+    
+    def _emit(self, event_type, app_id, app_name, **extra):
+        """Notifica os listeners (chamado sob o lock do gerenciador)"""
+        if not self._listeners:
+            return
+        
+        payload = {
+            "app_id": app_id,
+            "app_name": app_name,
+            "timestamp": datetime.now().isoformat(),
+            **extra
+        }
+        for listener in self._listeners:
+            try:
+                listener(event_type, payload)
+            except Exception as e:
+                logger.error(f"Erro em listener de eventos: {e}")
+    
+    @phase_timed("save_apps")
+    @synchronized
     def _save_apps(self):
         """Salva apps conectadas"""
+        self._publish_changes("apps")
+        if not self.persist:
+            return
+        
         try:
             with open(self.apps_file, 'w', encoding='utf-8') as f:
                 json.dump(self.connected_apps, f, indent=2, ensure_ascii=False)
@@ -71,8 +1880,14 @@ class AppConnectionManager:
                 logger.error(f"Erro ao carregar API keys: {e}")
         return {}
     
+    @phase_timed("save_api_keys")
+    @synchronized
     def _save_api_keys(self):
         """Salva chaves API"""
+        self._publish_changes("api_keys")
+        if not self.persist:
+            return
+        
         try:
             with open(self.api_keys_file, 'w', encoding='utf-8') as f:
                 json.dump(self.api_keys, f, indent=2, ensure_ascii=False)
@@ -89,17 +1904,25 @@ class AppConnectionManager:
                 logger.error(f"Erro ao carregar sessões: {e}")
         return {}
     
+    @phase_timed("save_sessions")
+    @synchronized
     def _save_sessions(self):
         """Salva sessões ativas"""
+        self._publish_changes("sessions")
+        if not self.persist:
+            return
+        
         try:
             with open(self.sessions_file, 'w', encoding='utf-8') as f:
                 json.dump(self.active_sessions, f, indent=2, ensure_ascii=False)
         except Exception as e:
             logger.error(f"Erro ao salvar sessões: {e}")
     
-    def generate_api_key(self, app_name):
+    @phase_timed("generate_api_key")
+    @synchronized
+    def generate_api_key(self, app_name, persist=True):
         """Gera uma nova API key"""
-        api_key = f"kgs_{uuid.uuid4().hex}"
+        api_key = self._new_credential("kgs")
         secret = uuid.uuid4().hex
         
         self.api_keys[api_key] = {
@@ -110,12 +1933,17 @@ class AppConnectionManager:
             "requests_count": 0,
             "active": True
         }
+        self._track_credential(api_key)
+        self._changed("api_keys", api_key)
         
-        self._save_api_keys()
+        if persist:
+            self._save_api_keys()
         return api_key, secret
     
+    @phase_timed("validate_api_key")
+    @synchronized
     def validate_api_key(self, api_key):
-        """Valida uma API key"""
+        """Valida uma API key (sem registrar uso: ver _record_key_use)"""
         if api_key not in self.api_keys:
             return False, "API key inválida"
         
@@ -124,17 +1952,22 @@ class AppConnectionManager:
         if not key_data.get("active", False):
             return False, "API key desativada"
         
-        # Atualizar último uso e contador
+        return True, key_data["app_name"]
+    
+    def _record_key_use(self, api_key):
+        """Atualiza último uso e contador da key (só depois que a conexão foi aceita)"""
+        key_data = self.api_keys[api_key]
         key_data["last_used"] = datetime.now().isoformat()
         key_data["requests_count"] = key_data.get("requests_count", 0) + 1
+        self._changed("api_keys", api_key)
         self._save_api_keys()
-        
-        return True, key_data["app_name"]
     
-    def register_app(self, app_name, app_version, platform, description=""):
+    @phase_timed("register_app")
+    @synchronized
+    def register_app(self, app_name, app_version, platform, description="", persist=True):
         """Registra uma nova aplicação"""
         app_id = f"app_{uuid.uuid4().hex[:12]}"
-        api_key, secret = self.generate_api_key(app_name)
+        api_key, secret = self.generate_api_key(app_name, persist=persist)
         
         self.connected_apps[app_id] = {
             "app_id": app_id,
@@ -147,12 +1980,19 @@ class AppConnectionManager:
             "last_connection": None,
             "status": "registered",
             "connection_count": 0,
-            "endpoints_used": []
+            "endpoints_used": [],
+            "credential_generation": 1
         }
+        self._app_by_key[api_key] = app_id
+        self.facets.add(app_id, self.connected_apps[app_id])
+        self._changed("apps", app_id)
+        self.names.add(app_id, app_name)
         
-        self._save_apps()
+        if persist:
+            self._save_apps()
+            logger.info(f"✅ App registrada: {app_name} (ID: {app_id})")
         
-        logger.info(f"✅ App registrada: {app_name} (ID: {app_id})")
+        self._emit("registered", app_id, app_name, platform=platform, version=app_version)
         
         return {
             "app_id": app_id,
@@ -161,140 +2001,1187 @@ class AppConnectionManager:
             "message": "Aplicação registrada com sucesso"
         }
     
+    def _validate_app_descriptor(self, descriptor):
+        """Valida os campos de registro de uma app (retorna o erro ou None)"""
+        if not isinstance(descriptor, dict):
+            return "Descritor deve ser um objeto JSON"
+        
+        for field in self.REQUIRED_APP_FIELDS:
+            if field not in descriptor:
+                return f"Campo obrigatório: {field}"
+            if not isinstance(descriptor[field], str) or not descriptor[field].strip():
+                return f"Campo inválido: {field}"
+        
+        if not isinstance(descriptor.get('description', ''), str):
+            return "Campo inválido: description"
+        return None
+    
+    @phase_timed("register_apps_batch")
+    @synchronized
+    def register_apps_batch(self, descriptors):
+        """Registra várias aplicações gravando cada arquivo uma única vez"""
+        results = []
+        registered = 0
+        
+        for index, descriptor in enumerate(descriptors):
+            error = self._validate_app_descriptor(descriptor)
+            if error:
+                results.append({"index": index, "success": False, "error": error})
+                continue
+            
+            data = self.register_app(
+                app_name=descriptor['app_name'],
+                app_version=descriptor['app_version'],
+                platform=descriptor['platform'],
+                description=descriptor.get('description', ''),
+                persist=False
+            )
+            results.append({"index": index, "success": True, "data": data})
+            registered += 1
+        
+        if registered:
+            self._save_api_keys()
+            self._save_apps()
+        
+        logger.info(f"✅ Registro em lote: {registered}/{len(descriptors)} apps registradas")
+        
+        return results
+    
+    @phase_timed("connect_app")
+    @synchronized
     def connect_app(self, api_key):
         """Conecta uma aplicação"""
+        if api_key not in self.api_keys and self.archive is not None:
+            error = self._rehydrate(api_key)
+            if error:
+                return False, error
+        
         valid, result = self.validate_api_key(api_key)
         
         if not valid:
             return False, result
         
         app_name = result
-        session_token = f"sess_{uuid.uuid4().hex}"
-        
-        # Encontrar app pelo nome
-        app_id = None
-        for aid, app_data in self.connected_apps.items():
-            if app_data["api_key"] == api_key:
-                app_id = aid
-                app_data["last_connection"] = datetime.now().isoformat()
-                app_data["status"] = "connected"
-                app_data["connection_count"] = app_data.get("connection_count", 0) + 1
-                break
+        session_token = self._new_credential("sess")
         
-        if not app_id:
+        # Encontrar app pela API key
+        app_id = self._app_by_key.get(api_key)
+        
+        if not app_id or app_id not in self.connected_apps:
             return False, "Aplicação não encontrada"
         
+        if self.max_sessions_per_app:
+            self._prune_invalid_sessions(app_id)
+            if len(self._sessions_by_app.get(app_id, ())) >= self.max_sessions_per_app:
+                return False, self.SESSION_LIMIT_ERROR
+        
+        self._record_key_use(api_key)
+        app_data = self.connected_apps[app_id]
+        app_data["last_connection"] = datetime.now().isoformat()
+        self._set_status(app_id, "connected")
+        app_data["connection_count"] = app_data.get("connection_count", 0) + 1
+        self._changed("apps", app_id)
+        
         # Criar sessão
-        self.active_sessions[session_token] = {
+        self._add_session(session_token, {
             "app_id": app_id,
             "app_name": app_name,
             "connected_at": datetime.now().isoformat(),
-            "expires_at": (datetime.now() + timedelta(hours=24)).isoformat(),
-            "requests": 0
-        }
+            "expires_at": self._session_expiry(),
+            "requests": 0,
+            "generation": self._credential_generation(app_id)
+        })
         
         self._save_apps()
         self._save_sessions()
         
         logger.info(f"🔗 App conectada: {app_name}")
+        self._emit("connected", app_id, app_name)
         
         return True, {
             "session_token": session_token,
             "app_name": app_name,
-            "expires_in": "24 hours",
+            "expires_in": f"{self.session_duration_hours} hours",
             "message": "Conexão estabelecida"
         }
     
+    def _rehydrate(self, api_key):
+        """Traz de volta do arquivo frio a app dona da API key (chamado sob o lock)
+        
+        Retorna a mensagem de erro se a key arquivada está desativada: a app continua no arquivo.
+        """
+        with timed_phase("rehydrate"):
+            entry = self.archive.get(api_key)
+        if entry is None:
+            return None
+        if not entry["api_keys"].get(api_key, {}).get("active", False):
+            return "API key desativada"
+        
+        app_id = entry["app_id"]
+        for key, key_data in entry["api_keys"].items():
+            self._apply_entry("api_keys", key, key_data)
+            self._changed("api_keys", key)
+        self._apply_entry("apps", app_id, entry["app"], emit=False)
+        self._changed("apps", app_id)
+        
+        # Grava nos stores quentes antes de tirar do arquivo: uma queda no meio duplica, não perde
+        self._save_api_keys()
+        self._save_apps()
+        self.archive.remove(api_key)
+        
+        logger.info(f"♨️ App reidratada do arquivo frio: {entry['app']['name']}")
+        self._emit("rehydrated", app_id, entry["app"]["name"])
+        return None
+    
+    def archive_idle_apps(self, idle_days):
+        """Move para o arquivo frio as apps sem conexão há idle_days, com suas API keys (inclusive as rotacionadas)"""
+        if self.archive is None:
+            return 0
+        cutoff = (datetime.now() - timedelta(days=idle_days)).isoformat()
+        
+        # 1) Seleção sob o lock; cópias, pois o arquivo é gravado fora dele
+        with self._lock:
+            previous_keys = {}
+            for api_key, key_data in self.api_keys.items():
+                if key_data.get("rotated_to"):
+                    previous_keys.setdefault(key_data["rotated_to"], []).append(api_key)
+            
+            entries = {}
+            for app_id, app_data in self.connected_apps.items():
+                last_activity = app_data.get("last_connection") or app_data.get("registered_at") or ""
+                if (app_data.get("status") in ("connected", "stale") or self._sessions_by_app.get(app_id)
+                        or last_activity >= cutoff):
+                    continue
+                
+                keys, pending = {}, [app_data["api_key"]]
+                while pending:
+                    api_key = pending.pop()
+                    if api_key in self.api_keys and api_key not in keys:
+                        keys[api_key] = self.api_keys[api_key]
+                        pending.extend(previous_keys.get(api_key, ()))
+                # Cópia profunda via marshal (só tipos JSON): bem mais rápida que copy.deepcopy
+                entries[app_data["api_key"]] = marshal.loads(marshal.dumps({"app_id": app_id, "app": app_data, "api_keys": keys}))
+        
+        if not entries:
+            return 0
+        
+        # 2) Gravação dos shards sem bloquear os requests
+        self.archive.put(entries)
+        
+        # 3) Remoção dos stores quentes (apps que voltaram a ser usadas no meio continuam quentes)
+        returned = []
+        with self._lock:
+            archived = 0
+            for api_key, entry in entries.items():
+                app_id = entry["app_id"]
+                app_data = self.connected_apps.get(app_id)
+                if (app_data is None or app_data["api_key"] != api_key or self._sessions_by_app.get(app_id)
+                        or app_data.get("last_connection") != entry["app"].get("last_connection")):
+                    returned.append(api_key)
+                    continue
+                
+                for key in entry["api_keys"]:
+                    self._apply_entry("api_keys", key, None)
+                    self._changed("api_keys", key)
+                self._apply_entry("apps", app_id, None)
+                self._changed("apps", app_id)
+                self._emit("archived", app_id, app_data["name"])
+                archived += 1
+            
+            if archived:
+                self._save_api_keys()
+                self._save_apps()
+        
+        for api_key in returned:
+            self.archive.remove(api_key)
+        
+        logger.info(f"❄️ Arquivo frio: {archived} apps inativas há {idle_days}+ dias arquivadas")
+        return archived
+    
+    def _set_status(self, app_id, status):
+        """Altera o status da app mantendo o índice secundário"""
+        app_data = self.connected_apps[app_id]
+        self.facets.update(app_id, "status", app_data.get("status"), status)
+        app_data["status"] = status
+        self._changed("apps", app_id)
+    
+    @synchronized
+    def query_apps(self, filters):
+        """Contagens por faceta e app_ids que atendem aos filtros"""
+        return self.facets.counts(), self.facets.match(filters) if filters else None
+    
+    @synchronized
+    def search_apps(self, prefix, limit=20):
+        """Apps cujo nome começa com o prefixo (case-insensitive)"""
+        return [
+            {
+                "app_id": app_id,
+                "name": self.connected_apps[app_id]["name"],
+                "platform": self.connected_apps[app_id]["platform"],
+                "status": self.connected_apps[app_id]["status"]
+            }
+            for app_id in self.names.search(prefix, limit)
+        ]
+    
+    def _add_session(self, session_token, session):
+        """Adiciona uma sessão e atualiza o índice por app"""
+        self.active_sessions[session_token] = session
+        self._sessions_by_app.setdefault(session["app_id"], set()).add(session_token)
+        self._track_credential(session_token)
+        self._changed("sessions", session_token)
+    
+    def _remove_session(self, session_token):
+        """Remove uma sessão e atualiza o índice por app"""
+        session = self.active_sessions.pop(session_token)
+        tokens = self._sessions_by_app.get(session["app_id"])
+        if tokens is not None:
+            tokens.discard(session_token)
+            if not tokens:
+                del self._sessions_by_app[session["app_id"]]
+        self._untrack_credential(session_token)
+        self._changed("sessions", session_token)
+        return session
+    
+    def _prune_invalid_sessions(self, app_id):
+        """Remove as sessões expiradas ou revogadas de uma app (O(sessões da app))"""
+        now = datetime.now()
+        for session_token in list(self._sessions_by_app.get(app_id, ())):
+            session = self.active_sessions[session_token]
+            if self._is_revoked(session):
+                self._remove_session(session_token)
+            elif now > datetime.fromisoformat(session["expires_at"]):
+                self._expire_session(session_token, persist=False)
+    
+    def _credential_generation(self, app_id):
+        """Geração atual das credenciais da app"""
+        app_data = self.connected_apps.get(app_id)
+        return app_data.get("credential_generation", 1) if app_data else None
+    
+    def _is_revoked(self, session):
+        """True se a sessão pertence a uma geração de credenciais revogada"""
+        return session.get("generation", 1) != self._credential_generation(session["app_id"])
+    
+    def _session_expiry(self):
+        """Data de expiração para uma sessão criada/renovada agora"""
+        return (datetime.now() + timedelta(hours=self.session_duration_hours)).isoformat()
+    
+    @phase_timed("refresh_session")
+    @synchronized
+    def refresh_session(self, session_token, rotate=False):
+        """Renova uma sessão válida (opcionalmente trocando o token)"""
+        session = self.active_sessions.get(session_token)
+        if session is None:
+            return False, "Sessão inválida"
+        
+        if self._is_revoked(session):
+            self._remove_session(session_token)
+            self._save_sessions()
+            return False, "Credenciais revogadas"
+        
+        if datetime.now() > datetime.fromisoformat(session["expires_at"]):
+            self._expire_session(session_token)
+            return False, "Sessão expirada"
+        
+        session["expires_at"] = self._session_expiry()
+        session["refreshed_at"] = datetime.now().isoformat()
+        self._changed("sessions", session_token)
+        
+        if rotate:
+            self._remove_session(session_token)
+            session_token = self._new_credential("sess")
+            self._add_session(session_token, session)
+        
+        self._save_sessions()
+        
+        return True, {
+            "session_token": session_token,
+            "app_name": session["app_name"],
+            "expires_at": session["expires_at"],
+            "expires_in": f"{self.session_duration_hours} hours",
+            "rotated": rotate
+        }
+    
+    @phase_timed("disconnect_app")
+    @synchronized
     def disconnect_app(self, session_token):
         """Desconecta uma aplicação"""
         if session_token not in self.active_sessions:
             return False, "Sessão não encontrada"
         
-        session = self.active_sessions.pop(session_token)
+        session = self._remove_session(session_token)
         app_id = session["app_id"]
         
-        if app_id in self.connected_apps:
-            self.connected_apps[app_id]["status"] = "disconnected"
+        # A app só fica "disconnected" quando não restam outras sessões
+        remaining = len(self._sessions_by_app.get(app_id, ()))
+        if app_id in self.connected_apps and not remaining:
+            self._set_status(app_id, "disconnected")
+            self._save_apps()
+        
+        self._save_sessions()
+        
+        logger.info(f"🔌 App desconectada: {session['app_name']}")
+        if not remaining:
+            self._emit("disconnected", app_id, session["app_name"])
+        
+        return True, "Desconectado com sucesso"
+    
+    def _expire_session(self, session_token, persist=True):
+        """Remove uma sessão expirada (chamado sob o lock)"""
+        session = self._remove_session(session_token)
+        if persist:
+            self._save_sessions()
+        self._emit("expired", session["app_id"], session["app_name"])
+    
+    @phase_timed("deactivate_api_keys")
+    @synchronized
+    def deactivate_api_keys(self, app_ids):
+        """Desativa as API keys das apps e invalida suas sessões (O(1) por app)"""
+        results = []
+        
+        for app_id in app_ids:
+            app_data = self.connected_apps.get(app_id)
+            if app_data is None:
+                results.append({"app_id": app_id, "success": False, "error": "Aplicação não encontrada"})
+                continue
+            
+            key_data = self.api_keys.get(app_data["api_key"])
+            if key_data is not None:
+                key_data["active"] = False
+                key_data["deactivated_at"] = datetime.now().isoformat()
+                self._changed("api_keys", app_data["api_key"])
+            
+            app_data["credential_generation"] = app_data.get("credential_generation", 1) + 1
+            self._set_status(app_id, "revoked")
+            
+            self._emit("revoked", app_id, app_data["name"])
+            results.append({
+                "app_id": app_id,
+                "success": True,
+                "generation": app_data["credential_generation"]
+            })
+        
+        if any(item["success"] for item in results):
+            self._save_api_keys()
+            self._save_apps()
+        
+        logger.info(f"⛔ API keys desativadas: {sum(item['success'] for item in results)}")
+        return results
+    
+    @phase_timed("rotate_api_keys")
+    @synchronized
+    def rotate_api_keys(self, app_ids):
+        """Gera novas credenciais para as apps e invalida as anteriores"""
+        results = []
+        
+        for app_id in app_ids:
+            app_data = self.connected_apps.get(app_id)
+            if app_data is None:
+                results.append({"app_id": app_id, "success": False, "error": "Aplicação não encontrada"})
+                continue
+            
+            old_key = app_data["api_key"]
+            api_key, secret = self.generate_api_key(app_data["name"], persist=False)
+            
+            key_data = self.api_keys.get(old_key)
+            if key_data is not None:
+                key_data["active"] = False
+                key_data["rotated_to"] = api_key
+                key_data["deactivated_at"] = datetime.now().isoformat()
+                self._changed("api_keys", old_key)
+            self._app_by_key.pop(old_key, None)
+            self._app_by_key[api_key] = app_id
+            
+            app_data["api_key"] = api_key
+            app_data["credential_generation"] = app_data.get("credential_generation", 1) + 1
+            self._changed("apps", app_id)
+            if app_data["status"] not in ("registered", "disconnected"):
+                self._set_status(app_id, "disconnected")
+            
+            self._emit("rotated", app_id, app_data["name"])
+            results.append({
+                "app_id": app_id,
+                "success": True,
+                "api_key": api_key,
+                "secret": secret,
+                "generation": app_data["credential_generation"]
+            })
+        
+        if any(item["success"] for item in results):
+            self._save_api_keys()
+            self._save_apps()
+        
+        logger.info(f"🔄 API keys rotacionadas: {sum(item['success'] for item in results)}")
+        return results
+    
+    @synchronized
+    def get_app_sessions(self, app_id):
+        """Sessões ativas de uma app, via índice"""
+        return {
+            session_token: dict(self.active_sessions[session_token])
+            for session_token in self._sessions_by_app.get(app_id, ())
+        }
+    
+    @phase_timed("revoke_app_sessions")
+    @synchronized
+    def revoke_app_sessions(self, app_id):
+        """Revoga todas as sessões de uma app (O(sessões da app))"""
+        if app_id not in self.connected_apps:
+            return False, "Aplicação não encontrada"
+        
+        tokens = self._sessions_by_app.pop(app_id, set())
+        for session_token in tokens:
+            del self.active_sessions[session_token]
+            self._untrack_credential(session_token)
+            self._changed("sessions", session_token)
+        
+        app_data = self.connected_apps[app_id]
+        if tokens:
+            self._save_sessions()
+        if app_data["status"] != "disconnected":
+            self._set_status(app_id, "disconnected")
+            self._save_apps()
+        
+        logger.info(f"⛔ Sessões revogadas: {app_data['name']} ({len(tokens)})")
+        self._emit("disconnected", app_id, app_data["name"], reason="revoked", revoked_sessions=len(tokens))
+        
+        return True, len(tokens)
+    
+    def peek_session(self, session_token):
+        """Consulta uma sessão válida sem contabilizar nem gravar (heartbeat)"""
+        session = self.active_sessions.get(session_token)
+        if (session is None or self._is_revoked(session)
+                or datetime.now() > datetime.fromisoformat(session["expires_at"])):
+            return None
+        return session
+    
+    @phase_timed("apply_presence")
+    @synchronized
+    def apply_presence_transitions(self, transitions):
+        """Persiste as transições de presença (uma gravação por lote)"""
+        changed = []
+        for app_id, status in transitions:
+            app_data = self.connected_apps.get(app_id)
+            if app_data is None or app_data["status"] == status:
+                continue
+            if status != "connected" and app_data["status"] == "disconnected":
+                continue
+            self._set_status(app_id, status)
+            changed.append((app_id, app_data["name"], status))
+        
+        if not changed:
+            return
+        
+        self._save_apps()
+        for app_id, app_name, status in changed:
+            logger.info(f"📡 Presença: {app_name} -> {status}")
+            self._emit(status, app_id, app_name)
+    
+    @phase_timed("apply_endpoint_usage")
+    @synchronized
+    def apply_endpoint_usage(self, usage):
+        """Grava o uso por endpoint em endpoints_used (uma gravação por flush)"""
+        changed = False
+        for app_id, endpoints in usage.items():
+            app_data = self.connected_apps.get(app_id)
+            if app_data is not None:
+                app_data["endpoints_used"] = endpoints
+                self._changed("apps", app_id)
+                changed = True
+        
+        if changed:
             self._save_apps()
+    
+    @phase_timed("validate_signature")
+    @synchronized
+    def validate_signed_request(self, api_key, timestamp, signature, method, path, body):
+        """Autentica um request assinado com o secret da API key (sem sessão)"""
+        key_data = self.api_keys.get(api_key)
+        if key_data is None:
+            return False, "API key inválida"
+        if not key_data.get("active", False):
+            self.signer.forget(api_key)
+            return False, "API key desativada"
+        
+        app_id = self._app_by_key.get(api_key)
+        if app_id is None or app_id not in self.connected_apps:
+            return False, "Aplicação não encontrada"
+        
+        error = self.signer.verify(api_key, key_data["secret"], method, path, timestamp, body, signature)
+        if error:
+            return False, error
+        
+        # Sem gravação por request: a key marcada vai na próxima gravação de keys (ou no encerramento)
+        key_data["last_used"] = datetime.now().isoformat()
+        key_data["requests_count"] = key_data.get("requests_count", 0) + 1
+        self._changed("api_keys", api_key)
+        
+        return True, {
+            "app_id": app_id,
+            "app_name": key_data["app_name"],
+            "connected_at": None,
+            "expires_at": None,
+            "requests": key_data["requests_count"],
+            "auth": "signature"
+        }
+    
+    @synchronized
+    def registry_counts(self):
+        return {"apps": len(self.connected_apps), "api_keys": len(self.api_keys), "sessions": len(self.active_sessions)}
+    
+    def iter_registry_lines(self, batch_size=1000):
+        """Linhas NDJSON do registro em lotes (lock retido só durante cada lote)"""
+        for record_type, (store, filename, prefix, required) in RECORD_TYPES.items():
+            with self._lock:
+                keys = list(self._store(store))
+            
+            for start in range(0, len(keys), batch_size):
+                with self._lock:
+                    source = self._store(store)
+                    lines = [
+                        to_line({"type": record_type, "id": key, "data": source[key]})
+                        for key in keys[start:start + batch_size]
+                        if key in source
+                    ]
+                yield lines
+    
+    @synchronized
+    def import_registry_batch(self, records, replace=True):
+        """Aplica um lote de registros já validados (retorna ids aplicados, ignorados)"""
+        applied = set()
+        skipped = 0
+        stores = set()
+        
+        for record in records:
+            store = RECORD_TYPES[record["type"]][0]
+            if not replace and record["id"] in self._store(store):
+                skipped += 1
+                continue
+            self._apply_entry(store, record["id"], record["data"], emit=False)
+            self._changed(store, record["id"])
+            stores.add(store)
+            applied.add(record["id"])
+        
+        for store in stores:
+            self._publish_changes(store)
+        return applied, skipped
+    
+    @synchronized
+    def save_registry(self):
+        """Grava os três stores (fim de uma importação)"""
+        self._save_apps()
+        self._save_api_keys()
+        self._save_sessions()
+    
+    @phase_timed("get_connected_apps")
+    @synchronized
+    def get_connected_apps(self):
+        """Lista apps conectadas"""
+        return {
+            "total": len(self.connected_apps),
+            "active_sessions": len(self.active_sessions),
+            "archived": self.archive.archived if self.archive is not None else 0,
+            "apps": list(self.connected_apps.values())
+        }
+    
+    @phase_timed("validate_session")
+    @synchronized
+    def validate_session(self, session_token):
+        """Valida uma sessão"""
+        if session_token not in self.active_sessions:
+            return False, "Sessão inválida"
+        
+        session = self.active_sessions[session_token]
+        expires_at = datetime.fromisoformat(session["expires_at"])
+        
+        # Geração revogada: inválida de imediato, sem varrer active_sessions
+        if self._is_revoked(session):
+            self._remove_session(session_token)
+            self._save_sessions()
+            return False, "Credenciais revogadas"
+        
+        if datetime.now() > expires_at:
+            self._expire_session(session_token)
+            return False, "Sessão expirada"
         
+        session["requests"] += 1
         self._save_sessions()
         
-        logger.info(f"🔌 App desconectada: {session['app_name']}")
+        return True, session
+
+
+class CodeNetServerV3:
+    """Servidor CodeNet v3.0.0"""
+    
+    def __init__(self):
+        self.app = Flask(__name__)
+        self.app.json = TimedJSONProvider(self.app)
+        CORS(self.app)
+        
+        self.version = "3.0.0"
+        self.start_time = datetime.now()
+        self.request_count = 0
+        self.config, config_errors = load_config()
+        configure_logging(self.config["logging"])
+        for key, error in config_errors.items():
+            logger.error(f"⚙️ Configuração inválida em {key}: {error} (ignorada)")
+        self.config_stamp = self._config_stamp()
+        self.source_fingerprint = source_fingerprint()
+        self.reexec_requested = False
+        
+        # Inicializar gerenciador de conexões
+        # Replicação: leader envia o log, followers atendem leituras localmente
+        replication_config = self.config["replication"]
+        self.replication_role = os.environ.get('CODENET_REPLICATION_ROLE', replication_config["role"])
+        
+        security_config = self.config["security"]
+        data_dir = os.environ.get('CODENET_DATA_DIR', 'config')
+        self.connection_manager = AppConnectionManager(
+            session_duration_hours=security_config["session_duration_hours"],
+            max_sessions_per_app=security_config["max_sessions_per_app"],
+            credential_filter=security_config["credential_filter"],
+            signature_window=security_config["signature_window_seconds"],
+            data_dir=data_dir,
+            persist=self.replication_role != "follower"
+        )
+        self.setup_replication(replication_config)
+        self.setup_worker_ring()
+        
+        # Arquivo frio: apps inativas saem dos stores quentes (só onde os stores são gravados)
+        archive_config = self.config["archive"]
+        if archive_config["enabled"] and self.connection_manager.persist:
+            self.connection_manager.archive = ColdArchive(os.path.join(data_dir, "archive"), archive_config["shards"])
+        self.archive_idle_days = archive_config["idle_days"]
+        self.archiver = PeriodicTask("cold-archive", archive_config["interval_seconds"], self.run_archive)
+        self.signed_requests_enabled = security_config["signed_requests"]
+        
+        # Eventos de apps para assinantes SSE
+        events_config = self.config["events"]
+        self.event_bus = AppEventBus(
+            history_size=events_config["history_size"],
+            subscriber_buffer=events_config["subscriber_buffer"]
+        )
+        self.event_keepalive = events_config["keepalive_seconds"]
+        self.connection_manager.add_listener(self.event_bus.publish)
+        
+        # Log de auditoria binário (aberto com as tarefas de fundo: um processo gravador por diretório)
+        audit_config = self.config["audit"]
+        self.audit_log = AuditLog(
+            os.path.join(data_dir, "audit"),
+            segment_max_bytes=int(audit_config["segment_max_mb"] * 1024 * 1024),
+            index_interval=audit_config["index_interval"],
+            queue_size=audit_config["queue_size"],
+            max_segments=audit_config["max_segments"]
+        )
+        self.audit_enabled = audit_config["enabled"]
+        self.connection_manager.add_listener(self.audit_log.on_app_event)
+        
+        # Presença por heartbeat (transições persistidas pelo gerenciador)
+        presence_config = self.config["presence"]
+        if self.replication_follower is not None:
+            # Em followers o heartbeat é encaminhado ao leader, dono das transições
+            presence_config = {**presence_config, "enabled": False}
+        self.presence = PresenceTracker(
+            self.connection_manager.apply_presence_transitions if self.replication_follower is None else (lambda transitions: None),
+            stale_after=presence_config["stale_after_seconds"],
+            offline_after=presence_config["offline_after_seconds"],
+            tick=presence_config["tick_seconds"]
+        )
+        for app_id, app_data in list(self.connection_manager.connected_apps.items()):
+            if app_data.get("status") in ("connected", "stale"):
+                self.presence.beat(app_id)
+        self.connection_manager.add_listener(self._on_app_event)
+        self.presence_enabled = presence_config["enabled"]
+        
+        # Uso por endpoint (memória; gravado em endpoints_used periodicamente)
+        usage_config = self.config["usage"]
+        self.endpoint_usage = EndpointUsageTracker(usage_config["top_endpoints"])
+        for app_id, app_data in list(self.connection_manager.connected_apps.items()):
+            self.endpoint_usage.load(app_id, app_data.get("endpoints_used"))
+        self.usage_flusher = PeriodicTask(
+            "endpoint-usage-flush",
+            usage_config["flush_interval_seconds"],
+            self.flush_endpoint_usage
+        )
+        self.request_rates = RequestRateTracker()
+        
+        # Limite de apps por requisição de registro em lote
+        self.max_batch_size = self.config["performance"]["max_batch_size"]
+        
+        # Esquemas dos corpos de registro e conexão (recusas contadas por rota)
+        validation_config = self.config["validation"]
+        self.rejections = RejectionCounters()
+        self.register_schema = RequestSchema("register", {
+            "app_name": (True, 256),
+            "app_version": (True, 64),
+            "platform": (True, 64),
+            "description": (False, 4096)
+        }, validation_config["register_max_body_bytes"], self.rejections)
+        self.connect_schema = RequestSchema("connect", {
+            "api_key": (True, 128)
+        }, validation_config["connect_max_body_bytes"], self.rejections, messages={
+            "api_key": "API key obrigatória"
+        })
+        
+        # Cache para otimização
+        self._cache = {}
+        self._cache_timeout = self.config["performance"]["cache_timeout"]
+        
+        # Instrumentação de fases (header Server-Timing)
+        self.phase_stats = PhaseStats()
+        self.server_timing_enabled = self.config["performance"]["server_timing"]
+        
+        # Requests em andamento e profiling sob demanda
+        self.inflight = InFlightRequests()
+        self.profiler = RuntimeProfiler(self.inflight)
+        self.admin_token = os.environ.get('CODENET_ADMIN_TOKEN')
+        
+        # Watchdog de requests lentos
+        self.slow_request_watchdog = SlowRequestWatchdog(
+            self.inflight,
+            self.config["performance"]["slow_request_threshold_ms"]
+        )
+        
+        # Configurar rotas
+        self.setup_request_hooks()
+        self.setup_routes()
+        
+        # Encerramento gracioso: drenagem e flush do estado pendente
+        self.shutdown_coordinator = ShutdownCoordinator(
+            self.inflight,
+            drain_timeout=self.config["shutdown"]["drain_timeout_seconds"]
+        )
+        
+        # Watcher do server_config.json: aplica ao vivo as chaves de LIVE_CONFIG
+        watcher_config = self.config["config_watcher"]
+        self.config_watcher = PeriodicTask(
+            "config-watcher",
+            watcher_config["interval_seconds"] if watcher_config["enabled"] else 0,
+            self.check_config_file
+        )
+        self.setup_shutdown_steps()
+        
+        # Modo preload (gunicorn.conf.py): threads não sobrevivem ao fork, cada worker as inicia
+        self.preload = os.environ.get('CODENET_PRELOAD') == '1'
+        if not self.preload:
+            self.start_background_tasks()
+        elif self.replication_role != "none":
+            logger.warning("⚠️ Modo preload com replicação: use um único worker por nó")
+        
+        logger.info(f"🚀 CodeNet Server v{self.version} iniciado")
+    
+    def setup_shutdown_steps(self):
+        """Etapas de flush executadas no encerramento (na ordem)"""
+        def stop_background_tasks():
+            self.presence.stop()
+            self.usage_flusher.stop()
+            self.slow_request_watchdog.stop()
+            self.config_watcher.stop()
+            self.archiver.stop()
+            return ["presence", "usage_flusher", "slow_request_watchdog", "config_watcher", "archiver"]
+        
+        def stop_replication():
+            if self.replication_leader is not None:
+                self.replication_leader.stop()
+            if self.replication_follower is not None:
+                self.replication_follower.stop()
+            return self.replication_role
+        
+        def flush_stores():
+            if not self.connection_manager.persist:
+                return "follower: stores pertencem ao leader"
+            self.connection_manager.save_registry()
+            return self.connection_manager.registry_counts()
+        
+        def flush_logs():
+            handlers = logging.getLogger().handlers
+            for handler in handlers:
+                handler.flush()
+            return len(handlers)
+        
+        coordinator = self.shutdown_coordinator
+        coordinator.add_step("background_tasks", stop_background_tasks)
+        coordinator.add_step("endpoint_usage", self.flush_endpoint_usage)
+        coordinator.add_step("audit_log", self.audit_log.close)
+        coordinator.add_step("stores", flush_stores)
+        coordinator.add_step("replication", stop_replication)
+        coordinator.add_step("logs", flush_logs)
+    
+    def start_background_tasks(self):
+        """Inicia replicação, presença, flush de uso, watchdog, watcher da configuração, auditoria e arquivo frio (no modo preload: após o fork, em cada worker)"""
+        # A replicação precisa rodar no processo que atende as escritas (nunca no master do Gunicorn)
+        if self.replication_leader is not None:
+            try:
+                self.replication_leader.start()
+            except OSError as e:
+                logger.error(f"❌ Replicação: porta {self.replication_leader.bind} indisponível ({e}); use um único worker por nó")
+                self.replication_leader = None
+                self.connection_manager.replication_log = None
+        if self.replication_follower is not None:
+            self.replication_follower.start()
+        if self.presence_enabled:
+            self.presence.start()
+        if self.audit_enabled:
+            if self.audit_log.open():
+                self.audit_log.start()
+            else:
+                logger.warning(f"🧾 Log de auditoria em uso por outro processo ({self.audit_log.directory}): desativado neste")
+        self.usage_flusher.start()
+        self.slow_request_watchdog.start()
+        self.config_watcher.start()
+        if self.connection_manager.archive is not None:
+            self.archiver.start()
+    
+    # Endpoints que alteram estado: em followers são encaminhados ao leader
+    FORWARDED_ENDPOINTS = {
+        "register_app", "register_apps_batch", "connect_app", "disconnect_app",
+        "refresh_session", "heartbeat", "revoke_app_sessions",
+        "deactivate_api_keys", "rotate_api_keys", "import_registry"
+    }
+    
+    def setup_replication(self, replication_config):
+        """Cria o leader ou o follower conforme CODENET_REPLICATION_ROLE (iniciados em start_background_tasks)
+        
+        Leader e followers precisam do mesmo CODENET_REPLICATION_TOKEN; sem ele a replicação não inicia.
+        """
+        self.replication_leader = None
+        self.replication_follower = None
+        
+        token = os.environ.get('CODENET_REPLICATION_TOKEN')
+        if self.replication_role in ("leader", "follower") and not token:
+            logger.error("❌ Replicação desativada: defina CODENET_REPLICATION_TOKEN (igual no leader e nos followers)")
+            return
+        
+        if self.replication_role == "leader":
+            self.replication_leader = ReplicationLeader(
+                self.connection_manager,
+                os.environ.get('CODENET_REPLICATION_BIND', replication_config["bind"]),
+                token,
+                max_entries=replication_config["log_size"]
+            )
+        
+        elif self.replication_role == "follower":
+            self.replication_follower = ReplicationFollower(
+                self.connection_manager,
+                os.environ.get('CODENET_REPLICATION_LEADER', replication_config["leader"]),
+                os.environ.get('CODENET_LEADER_URL', replication_config["leader_url"]),
+                token,
+                node=os.environ.get('CODENET_NODE_ID')
+            )
+            self.read_your_writes_timeout = replication_config["read_your_writes_timeout"]
+    
+    def setup_worker_ring(self):
+        """Atrás do codenet_proxy: emite só credenciais que o anel roteia a este worker"""
+        self.worker_id = os.environ.get('CODENET_WORKER_ID')
+        worker_ring = os.environ.get('CODENET_WORKER_RING')
+        if not self.worker_id or not worker_ring:
+            return
+        
+        from codenet_proxy import HashRing
+        ring = HashRing(worker_ring.split(","), self.config["proxy"]["virtual_nodes"])
+        self.connection_manager.credential_owner = lambda credential: ring.node_for(credential) == self.worker_id
+        logger.info(f"🔀 Worker {self.worker_id} no anel de {len(ring.nodes)} workers")
+    
+    def _forward_to_leader(self):
+        """Encaminha um request de escrita ao leader e aguarda sua replicação"""
+        follower = self.replication_follower
+        headers = {name: value for name, value in request.headers.items()
+                   if name.lower() not in ('host', 'content-length')}
+        
+        try:
+            response = follower.http.request(
+                request.method,
+                follower.leader_url + request.full_path.rstrip('?'),
+                headers=headers,
+                data=request.get_data(),
+                timeout=30
+            )
+        except requests.RequestException as e:
+            logger.error(f"🛰️ Leader indisponível: {e}")
+            return jsonify({"error": "Leader indisponível"}), 503
+        
+        # Leitura das próprias escritas: só responde após aplicar a alteração
+        seq = response.headers.get('X-CodeNet-Replication-Seq')
+        if seq:
+            follower.wait_for(int(seq), self.read_your_writes_timeout)
         
-        return True, "Desconectado com sucesso"
+        return self.app.response_class(
+            response.content,
+            status=response.status_code,
+            content_type=response.headers.get('Content-Type')
+        )
     
-    def get_connected_apps(self):
-        """Lista apps conectadas"""
-        return {
-            "total": len(self.connected_apps),
-            "active_sessions": len(self.active_sessions),
-            "apps": list(self.connected_apps.values())
-        }
+    # Configurações aplicadas sem reinício (SIGHUP ou /api/admin/config/reload)
+    LIVE_CONFIG = {
+        "security.session_duration_hours": lambda self, value: setattr(self.connection_manager, "session_duration_hours", value),
+        "security.max_sessions_per_app": lambda self, value: setattr(self.connection_manager, "max_sessions_per_app", value),
+        "security.signed_requests": lambda self, value: setattr(self, "signed_requests_enabled", value),
+        "security.signature_window_seconds": lambda self, value: self.connection_manager.signer.set_window(value),
+        "performance.server_timing": lambda self, value: setattr(self, "server_timing_enabled", value),
+        "performance.slow_request_threshold_ms": lambda self, value: self.slow_request_watchdog.set_threshold(value),
+        "performance.max_batch_size": lambda self, value: setattr(self, "max_batch_size", value),
+        "validation.register_max_body_bytes": lambda self, value: setattr(self.register_schema, "max_body_bytes", value),
+        "validation.connect_max_body_bytes": lambda self, value: setattr(self.connect_schema, "max_body_bytes", value),
+        "events.keepalive_seconds": lambda self, value: setattr(self, "event_keepalive", value),
+        "usage.flush_interval_seconds": lambda self, value: self.usage_flusher.set_interval(value),
+        "shutdown.drain_timeout_seconds": lambda self, value: setattr(self.shutdown_coordinator, "drain_timeout", value),
+        "config_watcher.interval_seconds": lambda self, value: self.config_watcher.set_interval(value),
+        "archive.idle_days": lambda self, value: setattr(self, "archive_idle_days", value),
+        "archive.interval_seconds": lambda self, value: self.archiver.set_interval(value),
+        "logging.level": lambda self, value: logging.getLogger().setLevel(value)
+    }
     
-    def validate_session(self, session_token):
-        """Valida uma sessão"""
-        if session_token not in self.active_sessions:
-            return False, "Sessão inválida"
+    def reload_config(self):
+        """Relê o server_config.json e aplica ao vivo o que não exige reinício"""
+        self.config_stamp = self._config_stamp()
+        config, errors = load_config()
+        # O ambiente não muda durante o processo: seus erros não bloqueiam o reload (já avisados na partida)
+        env_errors = {key: error for key, error in errors.items() if is_env_error(key)}
+        errors = {key: error for key, error in errors.items() if key not in env_errors}
+        if errors:
+            # Nada é aplicado parcialmente: corrigir o arquivo e recarregar de novo
+            logger.error(f"❌ Configuração inválida, mantida a atual: {json.dumps(errors, ensure_ascii=False)}")
+            return {"error": "Configuração inválida; mantida a atual", "errors": errors}
+        if env_errors:
+            logger.warning(f"⚙️ Variáveis de ambiente ignoradas: {json.dumps(env_errors, ensure_ascii=False)}")
         
-        session = self.active_sessions[session_token]
-        expires_at = datetime.fromisoformat(session["expires_at"])
+        previous, current = flatten_config(self.config), flatten_config(config)
+        changed = sorted(key for key in previous.keys() | current.keys() if previous.get(key) != current.get(key))
+        applied, restart_required, failed = [], [], {}
         
-        if datetime.now() > expires_at:
-            self.active_sessions.pop(session_token)
-            self._save_sessions()
-            return False, "Sessão expirada"
+        for key in changed:
+            setter = self.LIVE_CONFIG.get(key)
+            if setter is None or key not in current:
+                restart_required.append(key)
+                continue
+            try:
+                setter(self, current[key])
+                applied.append(key)
+            except Exception as e:
+                failed[key] = str(e)
         
-        session["requests"] += 1
-        self._save_sessions()
+        self.config = config
+        result = {"applied": applied, "restart_required": restart_required, "failed": failed}
+        logger.info(f"🔧 Configuração recarregada: {json.dumps(result, ensure_ascii=False)}")
+        return result
+    
+    def _config_stamp(self):
+        try:
+            stat = os.stat(CONFIG_FILE)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+    
+    def check_config_file(self):
+        """Watcher: recarrega quando o server_config.json muda no disco"""
+        if self._config_stamp() != self.config_stamp:
+            self.reload_config()
+    
+    def handle_reload(self):
+        """SIGHUP: aplica a configuração; se o código mudou, re-executa o processo mantendo o socket"""
+        self.reload_config()
         
-        return True, session
-
-
-class CodeNetServerV3:
-    """Servidor CodeNet v3.0.0"""
+        fingerprint = source_fingerprint()
+        if fingerprint == self.source_fingerprint:
+            return
+        
+        # Código novo com erro de sintaxe: continua servindo com o atual
+        for path in source_files():
+            try:
+                with open(path, 'rb') as f:
+                    compile(f.read(), path, 'exec')
+            except SyntaxError as e:
+                logger.error(f"❌ Recarga de código cancelada: {e}")
+                return
+        
+        logger.info("♻️ Código alterado: drenando e re-executando com o mesmo socket")
+        self.reexec_requested = True
+        self.shutdown_coordinator.shutdown("SIGHUP (recarga de código)")
     
-    def __init__(self):
-        self.app = Flask(__name__)
-        CORS(self.app)
+    def flush_endpoint_usage(self):
+        """Grava o uso por endpoint das apps alteradas"""
+        usage = self.endpoint_usage.drain_dirty()
+        if usage:
+            self.connection_manager.apply_endpoint_usage(usage)
+        return len(usage)
+    
+    def run_archive(self, idle_days=None):
+        """Arquiva as apps inativas (tarefa periódica ou /api/admin/archive/run)"""
+        return self.connection_manager.archive_idle_apps(self.archive_idle_days if idle_days is None else idle_days)
+    
+    def _on_app_event(self, event_type, payload):
+        """Mantém o rastreador de presença (e o uso por endpoint) alinhado às conexões"""
+        app_id = payload["app_id"]
+        if event_type == "connected":
+            self.presence.beat(app_id)
+        elif event_type in ("disconnected", "revoked", "rotated"):
+            self.presence.forget(app_id)
+        elif event_type == "archived":
+            self.presence.forget(app_id)
+            self.endpoint_usage.forget(app_id)
+            self.request_rates.forget(app_id)
+        elif event_type == "rehydrated":
+            app_data = self.connection_manager.connected_apps.get(app_id)
+            if app_data is not None:
+                self.endpoint_usage.load(app_id, app_data.get("endpoints_used"))
+    
+    def setup_request_hooks(self):
+        """Configura os hooks de instrumentação dos requests"""
         
-        self.version = "3.0.0"
-        self.start_time = datetime.now()
-        self.request_count = 0
+        @self.app.before_request
+        def start_timing():
+            g.request_started = time.perf_counter()
+            g.inflight = self.inflight.begin(f"{request.method} {request.path}")
+            
+            if self.profiler.active:
+                g.profile_handle = self.profiler.request_started()
         
-        # Inicializar gerenciador de conexões
-        self.connection_manager = AppConnectionManager()
+        @self.app.before_request
+        def forward_writes():
+            if self.replication_follower is not None and request.endpoint in self.FORWARDED_ENDPOINTS:
+                return self._forward_to_leader()
         
-        # Cache para otimização
-        self._cache = {}
-        self._cache_timeout = 60  # 60 segundos
+        @self.app.after_request
+        def add_server_timing(response):
+            started = g.get('request_started')
+            if started is None:
+                return response
+            
+            timings = dict(g.get('phase_timings', {}))
+            timings["total"] = (time.perf_counter() - started) * 1000
+            self.phase_stats.record(timings)
+            
+            if self.replication_leader is not None and request.method != 'GET':
+                response.headers['X-CodeNet-Replication-Seq'] = str(self.replication_leader.log.head)
+            
+            if self.server_timing_enabled or request.headers.get('X-Server-Timing'):
+                response.headers['Server-Timing'] = ", ".join(
+                    f"{name};dur={duration:.3f}" for name, duration in timings.items()
+                )
+            return response
         
-        # Configurar rotas
-        self.setup_routes()
+        @self.app.after_request
+        def end_inflight_on_close(response):
+            # Drenagem no encerramento: o request só termina após o corpo ser enviado
+            # (streams SSE saem no teardown; são fechados pelo coordenador)
+            if g.get('inflight') is not None and not response.is_streamed:
+                response.call_on_close(self.inflight.end)
+                g.inflight_until_close = True
+            return response
         
-        logger.info(f"🚀 CodeNet Server v{self.version} iniciado")
+        @self.app.teardown_request
+        def finish_request(error=None):
+            handle = g.pop('profile_handle', None)
+            if handle is not None:
+                self.profiler.request_finished(handle)
+            if not g.pop('inflight_until_close', False):
+                self.inflight.end()
     
     def require_auth(self, f):
         """Decorator para autenticação"""
         def decorated_function(*args, **kwargs):
-            auth_header = request.headers.get('Authorization')
+            with timed_phase("auth"):
+                if self.signed_requests_enabled and 'X-CodeNet-Signature' in request.headers:
+                    valid, result = self._validate_signed_request()
+                    
+                    if not valid:
+                        return jsonify({
+                            "error": "Assinatura inválida",
+                            "message": result
+                        }), 401
+                else:
+                    auth_header = request.headers.get('Authorization')
+                    
+                    if not auth_header or not auth_header.startswith('Bearer '):
+                        return jsonify({
+                            "error": "Autenticação necessária",
+                            "message": "Forneça um token válido no header Authorization"
+                        }), 401
+                    
+                    session_token = auth_header.replace('Bearer ', '')
+                    if not self.connection_manager.is_known_credential(session_token):
+                        return jsonify({
+                            "error": "Sessão inválida",
+                            "message": "Sessão inválida"
+                        }), 401
+                    
+                    valid, result = self.connection_manager.validate_session(session_token)
+                    
+                    if not valid:
+                        return jsonify({
+                            "error": "Sessão inválida",
+                            "message": result
+                        }), 401
             
-            if not auth_header or not auth_header.startswith('Bearer '):
-                return jsonify({
-                    "error": "Autenticação necessária",
-                    "message": "Forneça um token válido no header Authorization"
-                }), 401
+            # Adicionar informações da sessão ao request
+            request.session_data = result
+            g.inflight["app_id"] = result["app_id"]
+            self.presence.beat(result["app_id"])
+            self.endpoint_usage.record(result["app_id"], f"{request.method} {request.url_rule.rule}")
+            self.request_rates.record(result["app_id"])
+            return f(*args, **kwargs)
+        
+        decorated_function.__name__ = f.__name__
+        return decorated_function
+    
+    def _validate_signed_request(self):
+        """Valida os headers X-CodeNet-Key/Timestamp/Signature do request"""
+        api_key = request.headers.get('X-CodeNet-Key', '')
+        if not self.connection_manager.is_known_credential(api_key):
+            return False, "API key inválida"
+        
+        path = request.path
+        if request.query_string:
+            path += "?" + request.query_string.decode('latin-1')
+        
+        return self.connection_manager.validate_signed_request(
+            api_key,
+            request.headers.get('X-CodeNet-Timestamp'),
+            request.headers.get('X-CodeNet-Signature'),
+            request.method,
+            path,
+            request.get_data(cache=True)
+        )
+    
+    @staticmethod
+    def _parse_time(value):
+        """Epoch (segundos) ou ISO 8601 -> epoch; None se ausente"""
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return datetime.fromisoformat(value).timestamp()
+    
+    def require_body(self, schema):
+        """Decorator: valida o corpo JSON com o esquema (dados em request.body_data)"""
+        def decorator(f):
+            def decorated_function(*args, **kwargs):
+                data, error = schema.parse(request)
+                if error is not None:
+                    return error
+                request.body_data = data
+                return f(*args, **kwargs)
             
-            session_token = auth_header.replace('Bearer ', '')
-            valid, result = self.connection_manager.validate_session(session_token)
+            decorated_function.__name__ = f.__name__
+            return decorated_function
+        return decorator
+    
+    def require_admin(self, f):
+        """Decorator para endpoints administrativos (header X-Admin-Token)"""
+        def decorated_function(*args, **kwargs):
+            if not self.admin_token:
+                return jsonify({
+                    "error": "Endpoints administrativos desativados",
+                    "message": "Defina CODENET_ADMIN_TOKEN para habilitá-los"
+                }), 403
             
-            if not valid:
+            token = request.headers.get('X-Admin-Token', '')
+            if not hmac.compare_digest(token.encode(), self.admin_token.encode()):
                 return jsonify({
-                    "error": "Sessão inválida",
-                    "message": result
-                }), 401
+                    "error": "Acesso negado",
+                    "message": "Token administrativo inválido"
+                }), 403
             
-            # Adicionar informações da sessão ao request
-            request.session_data = result
             return f(*args, **kwargs)
         
         decorated_function.__name__ = f.__name__
@@ -329,18 +3216,48 @@ class CodeNetServerV3:
                         "/api/docs": "Documentação",
                         "/api/health": "Health check",
                         "/api/register": "Registrar nova app (POST)",
+                        "/api/register/batch": "Registrar várias apps (POST, {\"apps\": [...]})",
                         "/api/connect": "Conectar app (POST)"
                     },
                     "authenticated": {
                         "/api/status": "Status da sessão",
                         "/api/disconnect": "Desconectar (POST)",
-                        "/api/apps/list": "Listar apps conectadas"
+                        "/api/heartbeat": "Heartbeat de presença (POST, sem gravação em disco)",
+                        "/api/session/refresh": "Renovar sessão (POST, {\"rotate\": true} troca o token)",
+                        "/api/apps/list": "Listar apps conectadas",
+                        "/api/apps/query": "Contagens por platform/status/version (?platform=&status=&version= filtra IDs)",
+                        "/api/apps/search": "Buscar apps por prefixo do nome (?q=&limit=)",
+                        "/api/apps/<app_id>/stats": "Uso por endpoint e séries de requests (s/min/h) de uma app",
+                        "/api/events/stream": "Eventos de apps via SSE (suporta Last-Event-ID)",
+                        "/api/metrics/phases": "Estatísticas de tempo por fase"
+                    },
+                    "admin": {
+                        "/api/admin/apps/<app_id>/sessions": "Sessões ativas de uma app",
+                        "/api/admin/apps/<app_id>/sessions/revoke": "Revogar todas as sessões de uma app (POST)",
+                        "/api/admin/keys/deactivate": "Desativar API keys em lote (POST, {\"app_ids\": [...]})",
+                        "/api/admin/keys/rotate": "Rotacionar API keys em lote (POST, {\"app_ids\": [...]})",
+                        "/api/admin/replication": "Estado da replicação e atraso dos followers",
+                        "/api/admin/archive": "Estado do arquivo frio (apps inativas fora dos stores quentes)",
+                        "/api/admin/archive/run": "Arquivar agora as apps inativas (POST, ?idle_days=N)",
+                        "/api/admin/audit": "Log de auditoria por app e intervalo (?app_id=X&from=ISO&to=ISO&event=connected,disconnected&limit=N)",
+                        "/api/admin/rejections": "Requests recusados na validação (register/connect), por motivo",
+                        "/api/admin/config/reload": "Recarregar server_config.json ao vivo (POST; SIGHUP também recarrega o código)",
+                        "/api/admin/registry/export": "Exportar apps, API keys e sessões em NDJSON (streaming)",
+                        "/api/admin/registry/import": "Importar NDJSON em lotes (POST, ?batch_size=N&on_conflict=replace|skip; resposta NDJSON com progresso)",
+                        "/api/admin/profile": "Profiling por N segundos (POST, ?mode=cprofile|sampling&seconds=N&format=pstats|text|collapsed)"
                     }
                 },
+                "server_timing": "Envie o header X-Server-Timing: 1 para receber o header Server-Timing",
                 "authentication": {
                     "method": "Bearer Token",
                     "header": "Authorization: Bearer <session_token>",
-                    "expiration": "24 hours"
+                    "expiration": f"{self.connection_manager.session_duration_hours} hours",
+                    "admin_header": "X-Admin-Token: <CODENET_ADMIN_TOKEN>",
+                    "signed_requests": {
+                        "enabled": self.signed_requests_enabled,
+                        "headers": ["X-CodeNet-Key", "X-CodeNet-Timestamp", "X-CodeNet-Signature"],
+                        "signature": "hex(HMAC-SHA256(secret, METHOD\\nPATH\\nTIMESTAMP\\nhex(SHA256(body))))"
+                    }
                 },
                 "guide_url": "README_CONNECTION_GUIDE.md"
             })
@@ -355,21 +3272,16 @@ class CodeNetServerV3:
                 "version": self.version,
                 "timestamp": datetime.now().isoformat(),
                 "uptime_seconds": int((datetime.now() - self.start_time).total_seconds()),
-                "connected_apps": len(self.connection_manager.active_sessions)
+                "connected_apps": len(self.connection_manager.active_sessions),
+                "replication_role": self.replication_role
             })
         
         @self.app.route('/api/register', methods=['POST'])
+        @self.require_body(self.register_schema)
         def register_app():
             """Registra uma nova aplicação"""
             try:
-                data = request.get_json()
-                
-                required_fields = ['app_name', 'app_version', 'platform']
-                for field in required_fields:
-                    if field not in data:
-                        return jsonify({
-                            "error": f"Campo obrigatório: {field}"
-                        }), 400
+                data = request.body_data
                 
                 result = self.connection_manager.register_app(
                     app_name=data['app_name'],
@@ -388,23 +3300,60 @@ class CodeNetServerV3:
                 logger.error(f"Erro no registro: {e}")
                 return jsonify({"error": str(e)}), 500
         
+        @self.app.route('/api/register/batch', methods=['POST'])
+        def register_apps_batch():
+            """Registra várias aplicações em uma única gravação"""
+            try:
+                data = request.get_json(silent=True)
+                apps = data.get('apps') if isinstance(data, dict) else None
+                
+                if not isinstance(apps, list) or not apps:
+                    return jsonify({
+                        "error": "Campo obrigatório: apps (lista de aplicações)"
+                    }), 400
+                
+                if len(apps) > self.max_batch_size:
+                    return jsonify({
+                        "error": f"Lote excede o limite de {self.max_batch_size} aplicações"
+                    }), 413
+                
+                results = self.connection_manager.register_apps_batch(apps)
+                registered = sum(1 for item in results if item["success"])
+                
+                return jsonify({
+                    "success": registered > 0,
+                    "data": {
+                        "total": len(results),
+                        "registered": registered,
+                        "failed": len(results) - registered,
+                        "results": results
+                    },
+                    "message": "⚠️ IMPORTANTE: Salve o API Key e Secret em local seguro!"
+                }), 201 if registered else 400
+                
+            except Exception as e:
+                logger.error(f"Erro no registro em lote: {e}")
+                return jsonify({"error": str(e)}), 500
+        
         @self.app.route('/api/connect', methods=['POST'])
+        @self.require_body(self.connect_schema)
         def connect_app():
             """Conecta uma aplicação"""
             try:
-                data = request.get_json()
+                data = request.body_data
                 
-                if 'api_key' not in data:
+                if not self.connection_manager.is_known_credential(data['api_key']):
                     return jsonify({
-                        "error": "API key obrigatória"
-                    }), 400
+                        "error": "API key inválida"
+                    }), 401
                 
                 success, result = self.connection_manager.connect_app(data['api_key'])
                 
                 if not success:
+                    status = 429 if result == AppConnectionManager.SESSION_LIMIT_ERROR else 401
                     return jsonify({
                         "error": result
-                    }), 401
+                    }), status
                 
                 return jsonify({
                     "success": True,
@@ -440,6 +3389,11 @@ class CodeNetServerV3:
         @self.require_auth
         def disconnect_app(self=self):
             """Desconecta a aplicação atual"""
+            if request.session_data.get("auth") == "signature":
+                return jsonify({
+                    "error": "Requisições assinadas não possuem sessão"
+                }), 400
+            
             auth_header = request.headers.get('Authorization')
             session_token = auth_header.replace('Bearer ', '')
             
@@ -455,6 +3409,60 @@ class CodeNetServerV3:
                     "error": message
                 }), 400
         
+        @self.app.route('/api/heartbeat', methods=['POST'])
+        def heartbeat():
+            """Heartbeat leve: só atualiza o last-seen em memória"""
+            auth_header = request.headers.get('Authorization', '')
+            session = None
+            if auth_header.startswith('Bearer ') and self.connection_manager.is_known_credential(auth_header[7:]):
+                session = self.connection_manager.peek_session(auth_header[7:])
+            
+            if session is None:
+                return jsonify({"error": "Sessão inválida"}), 401
+            
+            self.presence.beat(session["app_id"])
+            return jsonify({"success": True, "status": "connected"})
+        
+        @self.app.route('/api/session/refresh', methods=['POST'])
+        def refresh_session():
+            """Renova a sessão atual sem reconectar"""
+            with timed_phase("auth"):
+                auth_header = request.headers.get('Authorization')
+                
+                if not auth_header or not auth_header.startswith('Bearer '):
+                    return jsonify({
+                        "error": "Autenticação necessária",
+                        "message": "Forneça um token válido no header Authorization"
+                    }), 401
+            
+            data = request.get_json(silent=True) or {}
+            if not isinstance(data, dict):
+                return jsonify({"error": "Corpo deve ser um objeto JSON"}), 400
+            rotate = data.get('rotate', False)
+            if not isinstance(rotate, bool):
+                return jsonify({"error": "Campo inválido: rotate (esperado booleano)"}), 400
+            session_token = auth_header.replace('Bearer ', '')
+            if not self.connection_manager.is_known_credential(session_token):
+                return jsonify({
+                    "error": "Sessão inválida",
+                    "message": "Sessão inválida"
+                }), 401
+            
+            success, result = self.connection_manager.refresh_session(
+                session_token, rotate=rotate
+            )
+            
+            if not success:
+                return jsonify({
+                    "error": "Sessão inválida",
+                    "message": result
+                }), 401
+            
+            return jsonify({
+                "success": True,
+                "data": result
+            })
+        
         @self.app.route('/api/apps/list')
         @self.require_auth
         def list_apps(self=self):
@@ -466,6 +3474,423 @@ class CodeNetServerV3:
                 "data": apps
             })
         
+        @self.app.route('/api/apps/query')
+        @self.require_auth
+        def query_apps(self=self):
+            """Contagens por platform/status/version e apps filtradas"""
+            filters = {facet: request.args[facet] for facet in FacetIndex.FIELDS if facet in request.args}
+            counts, matches = self.connection_manager.query_apps(filters)
+            
+            data = {"facets": counts}
+            if matches is not None:
+                data.update({"filters": filters, "total": len(matches), "app_ids": sorted(matches)})
+            
+            return jsonify({
+                "success": True,
+                "data": data
+            })
+        
+        @self.app.route('/api/apps/search')
+        @self.require_auth
+        def search_apps(self=self):
+            """Busca apps por prefixo do nome"""
+            prefix = request.args.get('q', '')
+            try:
+                limit = min(max(int(request.args.get('limit', 20)), 1), 1000)
+            except ValueError:
+                return jsonify({"error": "limit inválido"}), 400
+            
+            if not prefix:
+                return jsonify({"error": "Parâmetro obrigatório: q"}), 400
+            
+            results = self.connection_manager.search_apps(prefix, limit)
+            return jsonify({
+                "success": True,
+                "data": {"query": prefix, "total": len(results), "apps": results}
+            })
+        
+        @self.app.route('/api/apps/<app_id>/stats')
+        @self.require_auth
+        def app_stats(app_id, self=self):
+            """Estatísticas de uso de uma app"""
+            app_data = self.connection_manager.connected_apps.get(app_id)
+            if app_data is None:
+                return jsonify({"error": "Aplicação não encontrada"}), 404
+            
+            return jsonify({
+                "success": True,
+                "data": {
+                    "app_id": app_id,
+                    "name": app_data["name"],
+                    "status": app_data["status"],
+                    "connection_count": app_data.get("connection_count", 0),
+                    "endpoints": self.endpoint_usage.top(app_id),
+                    "requests": self.request_rates.series(app_id)
+                }
+            })
+        
+        @self.app.route('/api/events/stream')
+        @self.require_auth
+        def event_stream(self=self):
+            """Stream SSE de eventos registered/connected/disconnected/expired"""
+            last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+            try:
+                last_event_id = int(last_event_id) if last_event_id else None
+            except ValueError:
+                return jsonify({"error": "Last-Event-ID inválido"}), 400
+            
+            subscription, complete = self.event_bus.subscribe(last_event_id)
+            keepalive = self.event_keepalive
+            
+            def format_event(event_id, event_type, data):
+                payload = json.dumps(data, ensure_ascii=False)
+                prefix = f"id: {event_id}\n" if event_id is not None else ""
+                return f"{prefix}event: {event_type}\ndata: {payload}\n\n"
+            
+            def stream():
+                try:
+                    yield "retry: 3000\n\n"
+                    if not complete:
+                        # Eventos perdidos saíram do histórico: cliente deve ressincronizar
+                        yield format_event(None, "resync", {"message": "Histórico insuficiente, consulte /api/apps/list"})
+                    
+                    while True:
+                        events = subscription.next_batch(keepalive)
+                        for event in events:
+                            yield format_event(event["id"], event["event"], event["data"])
+                        
+                        if subscription.overflowed:
+                            last_id = events[-1]["id"] if events else last_event_id
+                            yield format_event(None, "overflow", {
+                                "message": "Consumidor lento: reconecte com Last-Event-ID",
+                                "last_event_id": last_id
+                            })
+                            logger.warning("🐌 Assinante SSE desconectado por lentidão")
+                            break
+                        
+                        if subscription.closed:
+                            break
+                        if not events:
+                            yield ": keepalive\n\n"
+                finally:
+                    self.event_bus.unsubscribe(subscription)
+            
+            return self.app.response_class(
+                stream(),
+                mimetype='text/event-stream',
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        
+        @self.app.route('/api/metrics/phases')
+        @self.require_auth
+        def phase_metrics(self=self):
+            """Estatísticas agregadas por fase (auth, storage, serialização)"""
+            return jsonify({
+                "success": True,
+                "data": self.phase_stats.snapshot()
+            })
+        
+        # ========== ROTAS ADMINISTRATIVAS ==========
+        
+        @self.app.route('/api/admin/config/reload', methods=['POST'])
+        @self.require_admin
+        def reload_config(self=self):
+            """Recarrega o server_config.json sem reiniciar (mesmo efeito do SIGHUP, sem troca de código)"""
+            result = self.reload_config()
+            if "error" in result:
+                return jsonify({"success": False, **result}), 400
+            return jsonify({"success": True, "data": result})
+        
+        @self.app.route('/api/admin/archive')
+        @self.require_admin
+        def archive_status(self=self):
+            """Estado do arquivo frio"""
+            archive = self.connection_manager.archive
+            if archive is None:
+                return jsonify({
+                    "error": "Arquivo frio desativado neste nó"
+                }), 404
+            
+            return jsonify({
+                "success": True,
+                "data": {**archive.stats(), "idle_days": self.archive_idle_days, "hot_apps": len(self.connection_manager.connected_apps)}
+            })
+        
+        @self.app.route('/api/admin/archive/run', methods=['POST'])
+        @self.require_admin
+        def archive_run(self=self):
+            """Arquiva agora as apps inativas (?idle_days=N; padrão: archive.idle_days)"""
+            if self.connection_manager.archive is None:
+                return jsonify({
+                    "error": "Arquivo frio desativado neste nó"
+                }), 404
+            
+            try:
+                idle_days = float(request.args.get('idle_days', self.archive_idle_days))
+            except ValueError:
+                return jsonify({
+                    "error": "idle_days deve ser um número"
+                }), 400
+            
+            archived = self.run_archive(idle_days)
+            return jsonify({
+                "success": True,
+                "data": {"archived": archived, **self.connection_manager.archive.stats()}
+            })
+        
+        @self.app.route('/api/admin/audit')
+        @self.require_admin
+        def audit_events(self=self):
+            """Eventos do log de auditoria (?app_id=X&from=T1&to=T2&event=connected,disconnected&limit=N)"""
+            try:
+                start = self._parse_time(request.args.get('from'))
+                end = self._parse_time(request.args.get('to'))
+                limit = min(max(int(request.args.get('limit', 1000)), 1), 100000)
+            except ValueError:
+                return jsonify({
+                    "error": "Parâmetros inválidos: from/to em ISO 8601 ou epoch; limit inteiro"
+                }), 400
+            
+            event_types = [name for name in request.args.get('event', '').split(',') if name]
+            unknown = [name for name in event_types if name not in EVENT_TYPES]
+            if unknown:
+                return jsonify({
+                    "error": f"Eventos desconhecidos: {', '.join(unknown)}",
+                    "events": list(EVENT_TYPES)
+                }), 400
+            
+            events = self.audit_log.query(
+                app_id=request.args.get('app_id'),
+                start=start,
+                end=end,
+                event_types=event_types,
+                limit=limit
+            )
+            return jsonify({
+                "success": True,
+                "data": {
+                    "count": len(events),
+                    "truncated": len(events) >= limit,
+                    "events": events,
+                    "log": self.audit_log.stats()
+                }
+            })
+        
+        @self.app.route('/api/admin/rejections')
+        @self.require_admin
+        def request_rejections(self=self):
+            """Requests recusados na validação do corpo, por rota e motivo"""
+            return jsonify({
+                "success": True,
+                "data": self.rejections.snapshot()
+            })
+        
+        @self.app.route('/api/admin/replication')
+        @self.require_admin
+        def replication_status(self=self):
+            """Estado da replicação (papel, seq aplicada e atraso)"""
+            if self.replication_leader is not None:
+                status = self.replication_leader.status()
+            elif self.replication_follower is not None:
+                status = self.replication_follower.status()
+            else:
+                status = {"role": "none"}
+            
+            return jsonify({"success": True, "data": status})
+        
+        @self.app.route('/api/admin/profile', methods=['POST'])
+        @self.require_admin
+        def profile_server(self=self):
+            """Profiling do servidor em execução por N segundos"""
+            mode = request.args.get('mode', 'sampling')
+            output = request.args.get('format', 'collapsed' if mode == 'sampling' else 'text')
+            
+            try:
+                seconds = float(request.args.get('seconds', 10))
+                interval_ms = float(request.args.get('interval_ms', 5))
+                limit = int(request.args.get('limit', 50))
+            except ValueError:
+                return jsonify({"error": "Parâmetros numéricos inválidos"}), 400
+            
+            if mode not in RuntimeProfiler.MODES:
+                return jsonify({"error": f"Modo inválido: {mode}"}), 400
+            if not 0 < seconds <= 300 or interval_ms <= 0:
+                return jsonify({"error": "seconds deve estar entre 0 e 300"}), 400
+            if output not in ({"pstats", "text"} if mode == "cprofile" else {"collapsed"}):
+                return jsonify({"error": f"Formato inválido para {mode}: {output}"}), 400
+            
+            try:
+                result = self.profiler.run(mode, seconds, interval_ms)
+            except ProfilerBusyError as e:
+                return jsonify({"error": str(e)}), 409
+            
+            if mode == "sampling":
+                return self.app.response_class(
+                    RuntimeProfiler.format_collapsed(result), mimetype='text/plain'
+                )
+            
+            body = RuntimeProfiler.format_stats(result, output, limit)
+            if output == "pstats":
+                return self.app.response_class(
+                    body,
+                    mimetype='application/octet-stream',
+                    headers={"Content-Disposition": "attachment; filename=codenet.pstats"}
+                )
+            return self.app.response_class(body, mimetype='text/plain')
+        
+        @self.app.route('/api/admin/apps/<app_id>/sessions')
+        @self.require_admin
+        def app_sessions(app_id, self=self):
+            """Sessões ativas de uma app"""
+            sessions = self.connection_manager.get_app_sessions(app_id)
+            return jsonify({
+                "success": True,
+                "data": {"app_id": app_id, "total": len(sessions), "sessions": sessions}
+            })
+        
+        @self.app.route('/api/admin/apps/<app_id>/sessions/revoke', methods=['POST'])
+        @self.require_admin
+        def revoke_app_sessions(app_id, self=self):
+            """Revoga todas as sessões de uma app"""
+            success, result = self.connection_manager.revoke_app_sessions(app_id)
+            
+            if not success:
+                return jsonify({"error": result}), 404
+            
+            return jsonify({
+                "success": True,
+                "data": {"app_id": app_id, "revoked_sessions": result}
+            })
+        
+        @self.app.route('/api/admin/keys/deactivate', methods=['POST'])
+        @self.require_admin
+        def deactivate_api_keys(self=self):
+            """Desativa em lote as API keys de várias apps"""
+            app_ids = (request.get_json(silent=True) or {}).get('app_ids')
+            if not isinstance(app_ids, list) or not app_ids:
+                return jsonify({"error": "Campo obrigatório: app_ids (lista)"}), 400
+            
+            results = self.connection_manager.deactivate_api_keys(app_ids)
+            return jsonify({
+                "success": True,
+                "data": {
+                    "deactivated": sum(1 for item in results if item["success"]),
+                    "results": results
+                }
+            })
+        
+        @self.app.route('/api/admin/keys/rotate', methods=['POST'])
+        @self.require_admin
+        def rotate_api_keys(self=self):
+            """Rotaciona em lote as API keys de várias apps"""
+            app_ids = (request.get_json(silent=True) or {}).get('app_ids')
+            if not isinstance(app_ids, list) or not app_ids:
+                return jsonify({"error": "Campo obrigatório: app_ids (lista)"}), 400
+            
+            results = self.connection_manager.rotate_api_keys(app_ids)
+            return jsonify({
+                "success": True,
+                "data": {
+                    "rotated": sum(1 for item in results if item["success"]),
+                    "results": results
+                },
+                "message": "⚠️ IMPORTANTE: Entregue as novas credenciais às apps!"
+            })
+        
+        @self.app.route('/api/admin/registry/export')
+        @self.require_admin
+        def export_registry(self=self):
+            """Exporta o registro completo em NDJSON sem montar o documento em memória"""
+            manager = self.connection_manager
+            
+            def generate():
+                yield to_line(header_record(manager.registry_counts()))
+                records = 0
+                for lines in manager.iter_registry_lines():
+                    records += len(lines)
+                    yield "".join(lines)
+                yield to_line(end_record(records))
+                logger.info(f"📤 Registro exportado: {records} registros")
+            
+            filename = f"codenet-registry-{datetime.now():%Y%m%d-%H%M%S}.ndjson"
+            return self.app.response_class(
+                generate(),
+                mimetype='application/x-ndjson',
+                headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+            )
+        
+        @self.app.route('/api/admin/registry/import', methods=['POST'])
+        @self.require_admin
+        def import_registry(self=self):
+            """Importa NDJSON em lotes validados; responde NDJSON com o progresso"""
+            on_conflict = request.args.get('on_conflict', 'replace')
+            if on_conflict not in ('replace', 'skip'):
+                return jsonify({"error": "on_conflict deve ser replace ou skip"}), 400
+            try:
+                batch_size = min(max(int(request.args.get('batch_size', 1000)), 1), self.max_batch_size)
+            except ValueError:
+                return jsonify({"error": "batch_size inválido"}), 400
+            
+            manager = self.connection_manager
+            stream = request.stream
+            max_reported_errors = 100
+            
+            def apply(batch, summary):
+                applied, skipped = manager.import_registry_batch(batch, replace=on_conflict == 'replace')
+                summary["imported"] += len(applied)
+                summary["skipped"] += skipped
+                for record in batch:
+                    # Registros ignorados (on_conflict=skip) não tocam uso nem presença da app existente
+                    if record["type"] == "app" and record["id"] in applied:
+                        self.endpoint_usage.load(record["id"], record["data"].get("endpoints_used"))
+                        if record["data"].get("status") in ("connected", "stale"):
+                            self.presence.beat(record["id"])
+            
+            def generate():
+                summary = {"type": "summary", "lines": 0, "imported": 0, "skipped": 0, "rejected": 0, "complete": False}
+                batch = []
+                
+                for line_number, line in enumerate(stream, 1):
+                    summary["lines"] = line_number
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError as e:
+                        record, error = None, f"JSON inválido: {e}"
+                    else:
+                        error = None
+                    
+                    if isinstance(record, dict) and record.get("type") in ("header", "end"):
+                        summary["complete"] = summary["complete"] or record["type"] == "end"
+                        continue
+                    
+                    error = error or validate_record(record)
+                    if error:
+                        summary["rejected"] += 1
+                        if summary["rejected"] <= max_reported_errors:
+                            yield to_line({"type": "error", "line": line_number, "error": error})
+                        continue
+                    
+                    batch.append(record)
+                    if len(batch) >= batch_size:
+                        apply(batch, summary)
+                        batch = []
+                        yield to_line({**summary, "type": "progress"})
+                
+                if batch:
+                    apply(batch, summary)
+                if summary["imported"]:
+                    manager.save_registry()
+                
+                logger.info(
+                    f"📥 Registro importado: {summary['imported']} importados, {summary['skipped']} ignorados, "
+                    f"{summary['rejected']} rejeitados"
+                )
+                yield to_line(summary)
+            
+            return self.app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
         # ========== ERROR HANDLERS ==========
         
         @self.app.errorhandler(404)
@@ -483,13 +3908,55 @@ class CodeNetServerV3:
             }), 500
     
     def run_server(self, host='0.0.0.0', port=8000):
-        """Executa o servidor"""
+        """Executa o servidor até SIGTERM/SIGINT e retorna o relatório de encerramento
+        
+        SIGHUP recarrega a configuração e, se o código mudou, re-executa o processo
+        (os.execv) herdando o socket: conexões chegam à fila do kernel durante a troca.
+        """
+        listen_fd = os.environ.pop('CODENET_LISTEN_FD', None)
         try:
-            logger.info(f"🌐 Servidor rodando em http://{host}:{port}")
-            self.app.run(host=host, port=port, threaded=True)
+            if listen_fd is not None:
+                http_server = make_server(host, port, self.app, threaded=True, fd=int(listen_fd))
+                os.close(int(listen_fd))
+                logger.info("♻️ Socket herdado da recarga de código")
+            else:
+                http_server = make_server(host, port, self.app, threaded=True)
         except Exception as e:
             logger.error(f"❌ Erro ao iniciar servidor: {e}")
             raise
+        
+        handover = {}
+        
+        def stop_accepting():
+            if self.reexec_requested:
+                # serve_forever fecha o socket ao retornar: a cópia mantém a escuta para o novo processo
+                handover['fd'] = os.dup(http_server.socket.fileno())
+            http_server.shutdown()
+            # Streams SSE não terminam sozinhos: fechar para liberar as threads
+            closed = self.event_bus.close_all()
+            if closed:
+                logger.info(f"📡 {closed} streams de eventos encerrados")
+        
+        self.shutdown_coordinator.stop_accepting = stop_accepting
+        self.shutdown_coordinator.install_signal_handlers()
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(
+                target=self.handle_reload, name="reload", daemon=True
+            ).start())
+        
+        logger.info(f"🌐 Servidor rodando em http://{host}:{port}")
+        http_server.serve_forever()
+        
+        self.shutdown_coordinator.wait()
+        if self.reexec_requested:
+            # Estado já gravado pelo coordenador; o novo processo recarrega os stores
+            fd = handover['fd']
+            os.set_inheritable(fd, True)
+            os.environ['CODENET_LISTEN_FD'] = str(fd)
+            os.execv(sys.executable, [sys.executable] + sys.argv)
+        
+        http_server.server_close()
+        return self.shutdown_coordinator.report
 
 
 def main():
@@ -499,7 +3966,7 @@ def main():
     print("=" * 60)
     
     try:
-        server = CodeNetServerV3()
+        server = server_instance
         port = int(os.environ.get('PORT', 8000))
         
         print(f"\n✅ Servidor configurado")
@@ -507,10 +3974,18 @@ def main():
         print(f"📚 Documentação: http://localhost:{port}/api/docs")
         print(f"\n⌨️  Pressione Ctrl+C para parar\n")
         
-        server.run_server(host='0.0.0.0', port=port)
+        report = server.run_server(host='0.0.0.0', port=port)
         
-    except KeyboardInterrupt:
         print("\n\n⏹️  Servidor parado")
+        drain = report["drain"]
+        print(f"⏳ Requests drenados: {drain['completed']}/{drain['in_flight']} ({len(drain['abandoned'])} abandonados)")
+        for name, step in report["steps"].items():
+            status = f"❌ {step['error']}" if "error" in step else f"✅ {step['flushed']}"
+            print(f"   {name}: {status}")
+        
+        if server.shutdown_coordinator.failed:
+            sys.exit(1)
+        
     except Exception as e:
         print(f"\n❌ Erro: {e}")
         sys.exit(1)
@@ -0,0 +1,50 @@
+"""
+🦄 Configuração do Gunicorn - CodeNet Server v3.0
+Modo preload: stores carregados uma vez no master e compartilhados (copy-on-write) com os workers
+
+Uso: gunicorn  (lido automaticamente do diretório raiz)
+     CODENET_PRELOAD=0 gunicorn  (cada worker carrega os stores)
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+timeout = 30
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 8))
+pythonpath = "app"
+wsgi_app = "codenet_server_v3:app"
+
+preload_app = os.environ.get("CODENET_PRELOAD", "1") == "1"
+
+if preload_app:
+    # Lido pelo servidor: threads de fundo só são iniciadas após o fork
+    os.environ["CODENET_PRELOAD"] = "1"
+    # Sem coletas no master durante a carga: nada de páginas liberadas/reescritas antes do fork
+    gc.disable()
+
+
+def when_ready(server):
+    """Master pronto (app já importada): congela os objetos carregados antes dos forks"""
+    if preload_app:
+        # Objetos congelados saem das gerações do GC: coletas nos workers não
+        # escrevem nos cabeçalhos deles (o que sujaria todas as páginas dos stores)
+        gc.freeze()
+        server.log.info(f"🧊 {gc.get_freeze_count()} objetos congelados para os workers")
+
+
+def post_fork(server, worker):
+    """Worker recém-criado: reativa o GC e inicia as threads de fundo"""
+    if preload_app:
+        gc.enable()
+        from codenet_server_v3 import server_instance
+        server_instance.start_background_tasks()
+
+
+def worker_exit(server, worker):
+    """Worker encerrando (Gunicorn já drenou os requests): grava o estado pendente"""
+    from codenet_server_v3 import server_instance
+    server_instance.shutdown_coordinator.shutdown("gunicorn worker_exit")
@@ -0,0 +1,162 @@
+"""
+🧠 Medição de Memória por Worker - CodeNet Server v3.0
+Compara RSS/PSS/memória privada dos workers Gunicorn com e sem o modo preload
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def create_registry(data_dir, apps, sessions_per_app=1):
+    """Gera stores sintéticos (apps, API keys e sessões) no diretório de dados"""
+    connected_apps, api_keys, active_sessions = {}, {}, {}
+    now = datetime.now().isoformat()
+    expires_at = (datetime.now() + timedelta(days=1)).isoformat()
+
+    for i in range(apps):
+        app_id = f"app_{uuid.uuid4().hex[:12]}"
+        api_key = f"kgs_{uuid.uuid4().hex}"
+        connected_apps[app_id] = {
+            "app_id": app_id,
+            "name": f"Benchmark App {i}",
+            "version": f"1.{i % 10}",
+            "platform": ("Windows", "Linux", "macOS")[i % 3],
+            "description": "App sintética para medição de memória",
+            "api_key": api_key,
+            "registered_at": now,
+            "last_connection": now,
+            "status": "registered",
+            "connection_count": 1,
+            "endpoints_used": [],
+            "credential_generation": 1
+        }
+        api_keys[api_key] = {
+            "app_name": f"Benchmark App {i}",
+            "secret": uuid.uuid4().hex,
+            "created_at": now,
+            "last_used": now,
+            "requests_count": 0,
+            "active": True
+        }
+        for _ in range(sessions_per_app):
+            active_sessions[f"sess_{uuid.uuid4().hex}"] = {
+                "app_id": app_id,
+                "app_name": f"Benchmark App {i}",
+                "connected_at": now,
+                "expires_at": expires_at,
+                "requests": 0,
+                "generation": 1
+            }
+
+    for filename, store in (("connected_apps.json", connected_apps), ("api_keys.json", api_keys),
+                            ("active_sessions.json", active_sessions)):
+        with open(os.path.join(data_dir, filename), "w", encoding="utf-8") as f:
+            json.dump(store, f, indent=2, ensure_ascii=False)
+
+
+def read_memory(pid):
+    """RSS, PSS e memória privada (KB) de um processo via /proc"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss": values["Rss"],
+        "pss": values["Pss"],
+        "private": values["Private_Clean"] + values["Private_Dirty"]
+    }
+
+
+def worker_pids(master_pid):
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def measure(data_dir, workers, preload, port, requests_per_worker):
+    env = dict(os.environ)
+    env.update({
+        "PORT": str(port),
+        "WEB_CONCURRENCY": str(workers),
+        "CODENET_PRELOAD": "1" if preload else "0",
+        "CODENET_DATA_DIR": data_dir
+    })
+    master = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn"],
+        cwd=ROOT_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    try:
+        base = f"http://127.0.0.1:{port}"
+        deadline = time.time() + 120
+        while len(worker_pids(master.pid)) < workers or not _healthy(base):
+            if time.time() > deadline or master.poll() is not None:
+                raise RuntimeError("Gunicorn não iniciou")
+            time.sleep(0.5)
+
+        # Carga leve de leitura distribuída entre os workers (sem gravação dos stores)
+        session = requests.Session()
+        for i in range(requests_per_worker * workers):
+            session.get(f"{base}/api/health" if i % 2 else f"{base}/api/docs")
+        time.sleep(1)
+
+        master_memory = read_memory(master.pid)
+        memories = [read_memory(pid) for pid in worker_pids(master.pid)]
+    finally:
+        master.send_signal(signal.SIGTERM)
+        try:
+            master.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            master.kill()
+
+    average = {key: sum(m[key] for m in memories) // len(memories) for key in ("rss", "pss", "private")}
+    total_pss = master_memory["pss"] + sum(m["pss"] for m in memories)
+    return average, total_pss
+
+
+def _healthy(base):
+    try:
+        return requests.get(f"{base}/api/health", timeout=1).status_code == 200
+    except requests.RequestException:
+        return False
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Memória por worker com e sem preload")
+    parser.add_argument("--apps", type=int, default=50000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests-per-worker", type=int, default=200)
+    parser.add_argument("--port", type=int, default=18500)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="codenet-memory-")
+    print(f"🧪 Gerando {args.apps} apps em {data_dir}")
+    create_registry(data_dir, args.apps)
+    size_mb = sum(os.path.getsize(os.path.join(data_dir, name)) for name in os.listdir(data_dir)) / 1024 / 1024
+    print(f"📦 Stores: {size_mb:.1f} MB em disco\n")
+
+    print(f"{'modo':<10}{'workers':>8}{'RSS/worker':>14}{'PSS/worker':>14}{'privada/worker':>16}{'PSS total':>12}")
+    for preload in (False, True):
+        for workers in args.workers:
+            average, total_pss = measure(data_dir, workers, preload, args.port, args.requests_per_worker)
+            mode = "preload" if preload else "padrão"
+            print(f"{mode:<10}{workers:>8}{average['rss'] / 1024:>11.1f} MB{average['pss'] / 1024:>11.1f} MB"
+                  f"{average['private'] / 1024:>13.1f} MB{total_pss / 1024:>9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+🔀 Teste do Proxy - CodeNet Server v3.0
+Sobe o proxy com workers locais e valida o roteamento por hash consistente
+"""
+
+import os
+import sys
+import time
+import signal
+import tempfile
+import subprocess
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROXY_SCRIPT = os.path.join(ROOT_DIR, "app", "codenet_proxy.py")
+ADMIN_TOKEN = "proxy-test"
+ADMIN = {"X-Admin-Token": ADMIN_TOKEN}
+
+
+def check(name, condition, detail=""):
+    icon = "✅" if condition else "❌"
+    print(f"{icon} {name} {detail}")
+    return condition
+
+
+def wait_for(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return True
+        except requests.RequestException:
+            time.sleep(0.2)
+    return False
+
+
+def main(port=18100, worker_base_port=18101, workers=3):
+    """Função principal"""
+    data_dir = tempfile.mkdtemp(prefix="codenet-proxy-")
+    proxy = subprocess.Popen(
+        [sys.executable, PROXY_SCRIPT, "--port", str(port), "--workers", str(workers),
+         "--worker-base-port", str(worker_base_port), "--data-dir", data_dir],
+        cwd=ROOT_DIR, stdout=subprocess.DEVNULL,
+        env=dict(os.environ, CODENET_ADMIN_TOKEN=ADMIN_TOKEN)
+    )
+    base = f"http://127.0.0.1:{port}"
+    results = []
+
+    try:
+        if not wait_for(f"{base}/proxy/status"):
+            raise RuntimeError("Proxy não respondeu")
+
+        # Registros distribuídos entre workers; conexões voltam ao dono da API key
+        sessions = []
+        app_ids = {}
+        workers_seen = set()
+        for i in range(12):
+            response = requests.post(f"{base}/api/register", json={
+                "app_name": f"Proxy App {i}", "app_version": "1.0", "platform": "Linux"
+            })
+            owner = response.headers.get("X-CodeNet-Worker")
+            workers_seen.add(owner)
+            api_key = response.json()["data"]["api_key"]
+            app_ids.setdefault(owner, response.json()["data"]["app_id"])
+
+            response = requests.post(f"{base}/api/connect", json={"api_key": api_key})
+            same_worker = response.headers.get("X-CodeNet-Worker") == owner
+            if response.status_code != 200 or not same_worker:
+                results.append(check(f"Conexão no worker dono ({api_key[:12]}…)", False))
+                continue
+            sessions.append((response.json()["data"]["session_token"], owner))
+
+        results.append(check("Registros distribuídos", len(workers_seen) == workers, f"({len(workers_seen)} workers)"))
+        results.append(check("Conexões no worker dono", len(sessions) == 12))
+
+        # Requests autenticados seguem o token até o worker que o emitiu
+        routed = all(
+            requests.get(f"{base}/api/status", headers={"Authorization": f"Bearer {token}"})
+            .headers.get("X-CodeNet-Worker") == owner
+            for token, owner in sessions
+        )
+        results.append(check("Tokens roteados ao worker dono", routed))
+
+        # Rotas administrativas por app vão a todos os workers (o app_id não segue o anel)
+        app_id = next(iter(app_ids.values()))
+        response = requests.get(f"{base}/api/admin/apps/{app_id}/sessions", headers=ADMIN)
+        results.append(check("Sessões da app via proxy", response.status_code == 200
+                             and response.json()["data"]["total"] == 1))
+
+        response = requests.post(f"{base}/api/admin/keys/rotate", headers=ADMIN,
+                                 json={"app_ids": list(app_ids.values()) + ["app_inexistente"]})
+        data = response.json()["data"]
+        results.append(check("Rotação em apps de todos os workers", data["rotated"] == len(app_ids)
+                             and len(data["results"]) == len(app_ids) + 1, f"({data['rotated']}/{len(app_ids)})"))
+
+        response = requests.get(f"{base}/proxy/status")
+        results.append(check("Status do proxy exige token", response.status_code == 403))
+
+        # Ejeção: derrubar um worker tira-o do anel
+        status = requests.get(f"{base}/proxy/status", headers=ADMIN).json()
+        victim = status["workers"][0]
+        os.kill(victim["pid"], signal.SIGSTOP)
+        time.sleep(12)
+        status = requests.get(f"{base}/proxy/status", headers=ADMIN).json()
+        ejected = not next(w for w in status["workers"] if w["address"] == victim["address"])["healthy"]
+        results.append(check("Worker sem resposta ejetado", ejected))
+
+        response = requests.post(f"{base}/api/register", json={
+            "app_name": "Depois da ejeção", "app_version": "1.0", "platform": "Linux"
+        })
+        results.append(check("Registro sem o worker ejetado",
+                             response.status_code == 201 and response.headers.get("X-CodeNet-Worker") != victim["address"]))
+
+        os.kill(victim["pid"], signal.SIGCONT)
+        time.sleep(5)
+        status = requests.get(f"{base}/proxy/status", headers=ADMIN).json()
+        readmitted = next(w for w in status["workers"] if w["address"] == victim["address"])["healthy"]
+        results.append(check("Worker readmitido", readmitted))
+
+        # Pool de conexões
+        start = time.perf_counter()
+        for _ in range(200):
+            requests.get(f"{base}/api/health")
+        elapsed = time.perf_counter() - start
+        print(f"\n📊 200 requests via proxy em {elapsed:.2f}s ({200 / elapsed:.0f} req/s)")
+        for worker in requests.get(f"{base}/proxy/status", headers=ADMIN).json()["workers"]:
+            print(f"   {worker['address']}: healthy={worker['healthy']} idle={worker['idle_connections']}")
+    finally:
+        proxy.send_signal(signal.SIGINT)
+        proxy.wait(timeout=15)
+
+    passed = sum(results)
+    print(f"\n📈 {passed}/{len(results)} verificações passaram")
+    sys.exit(0 if passed == len(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+📦 Teste do Registro - CodeNet Server v3.0
+Sobe um servidor local e valida a importação NDJSON: registros malformados são rejeitados
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_SCRIPT = os.path.join(ROOT_DIR, "app", "codenet_server_v3.py")
+ADMIN_TOKEN = "registry-test"
+PORT = 18200
+
+
+def check(name, condition, detail=""):
+    icon = "✅" if condition else "❌"
+    print(f"{icon} {name} {detail}")
+    return condition
+
+
+def start_server(data_dir, timeout=20):
+    os.makedirs(os.path.join(ROOT_DIR, "logs"), exist_ok=True)
+    env = dict(os.environ)
+    env.update({
+        "PORT": str(PORT),
+        "CODENET_ADMIN_TOKEN": ADMIN_TOKEN,
+        "CODENET_DATA_DIR": data_dir
+    })
+    process = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT],
+        cwd=ROOT_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    deadline = time.time() + timeout
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError("Servidor encerrou ao iniciar (porta em uso?)")
+        try:
+            requests.get(f"http://127.0.0.1:{PORT}/api/health", timeout=1)
+            return process
+        except requests.RequestException:
+            if time.time() > deadline:
+                process.terminate()
+                raise RuntimeError("Servidor não respondeu")
+            time.sleep(0.2)
+
+
+def import_lines(url, records, on_conflict="replace"):
+    """Envia registros ao import e retorna (resumo, erros reportados)"""
+    body = "".join(json.dumps(record) + "\n" for record in records)
+    response = requests.post(
+        f"{url}/api/admin/registry/import", params={"on_conflict": on_conflict},
+        data=body.encode("utf-8"), headers={"X-Admin-Token": ADMIN_TOKEN, "Content-Type": "application/x-ndjson"}
+    )
+    messages = [json.loads(line) for line in response.text.splitlines() if line]
+    summary = next(message for message in messages if message["type"] == "summary")
+    return summary, [message["error"] for message in messages if message["type"] == "error"]
+
+
+def main():
+    """Função principal"""
+    data_dir = tempfile.mkdtemp(prefix="codenet-registry-")
+    print(f"🚀 Subindo servidor (dados em {data_dir})")
+    process = start_server(data_dir)
+    url = f"http://127.0.0.1:{PORT}"
+    results = []
+
+    try:
+        response = requests.post(f"{url}/api/register", json={
+            "app_name": "Registry App", "app_version": "1.0", "platform": "Linux"
+        })
+        app_id = response.json()["data"]["app_id"]
+        api_key = response.json()["data"]["api_key"]
+        token = requests.post(f"{url}/api/connect", json={"api_key": api_key}).json()["data"]["session_token"]
+
+        session = {
+            "app_id": app_id,
+            "app_name": "Registry App",
+            "connected_at": "2026-01-01T00:00:00",
+            "expires_at": "2099-01-01T00:00:00",
+            "requests": 0
+        }
+        malformed = [
+            {"type": "session", "id": "sess_badexpiry", "data": dict(session, expires_at="not-a-date")},
+            {"type": "session", "id": "sess_nocounters",
+             "data": {key: value for key, value in session.items() if key not in ("requests", "connected_at")}},
+            {"type": "session", "id": "sess_textcount", "data": dict(session, requests="7")},
+            {"type": "api_key", "id": "kgs_badactive", "data": {"app_name": "X", "secret": "s", "active": "yes"}},
+            {"type": "app", "id": "app_badstatus", "data": {
+                "app_id": "app_badstatus", "name": "X", "version": "1", "platform": "Linux",
+                "api_key": "kgs_badactive", "status": "sleeping"
+            }}
+        ]
+        summary, errors = import_lines(url, malformed)
+        results.append(check("Registros malformados rejeitados", summary["rejected"] == len(malformed)
+                             and summary["imported"] == 0, f"({summary['rejected']}/{len(malformed)})"))
+        for error in errors:
+            print(f"   {error}")
+
+        # Nenhum registro rejeitado chega aos stores: tokens malformados continuam desconhecidos
+        for record in malformed[:3]:
+            response = requests.get(f"{url}/api/status", headers={"Authorization": f"Bearer {record['id']}"})
+            results.append(check(f"Token {record['id']} recusado", response.status_code == 401,
+                                 f"(HTTP {response.status_code})"))
+
+        summary, errors = import_lines(url, [{"type": "session", "id": "sess_valid", "data": session}])
+        results.append(check("Sessão válida importada", summary["imported"] == 1, str(errors or "")))
+        response = requests.get(f"{url}/api/status", headers={"Authorization": "Bearer sess_valid"})
+        results.append(check("Sessão importada utilizável", response.status_code == 200, f"(HTTP {response.status_code})"))
+
+        # Exportação do próprio servidor reimportada sem rejeições
+        export = requests.get(f"{url}/api/admin/registry/export", headers={"X-Admin-Token": ADMIN_TOKEN}).text
+        records = [json.loads(line) for line in export.splitlines() if line]
+        summary, errors = import_lines(url, records, on_conflict="skip")
+        results.append(check("Exportação reimportada sem rejeições", summary["rejected"] == 0, str(errors or "")))
+
+        response = requests.get(f"{url}/api/status", headers={"Authorization": f"Bearer {token}"})
+        results.append(check("Sessão original intacta", response.status_code == 200))
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    passed = sum(results)
+    print(f"\n📈 {passed}/{len(results)} verificações passaram")
+    sys.exit(0 if passed == len(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+🛰️ Teste de Replicação - CodeNet Server v3.0
+Sobe um leader e dois followers locais e valida a replicação entre eles
+"""
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_SCRIPT = os.path.join(ROOT_DIR, "app", "codenet_server_v3.py")
+ADMIN_TOKEN = "replication-test"
+REPLICATION_TOKEN = "replication-test-secret"
+
+
+class ReplicationCluster:
+    """Processos locais: 1 leader + N followers"""
+
+    def __init__(self, base_port=18000, replication_port=19100, followers=2):
+        self.base_port = base_port
+        self.replication_port = replication_port
+        self.follower_count = followers
+        self.processes = []
+        self.data_dir = tempfile.mkdtemp(prefix="codenet-replication-")
+
+    def url(self, index):
+        return f"http://127.0.0.1:{self.base_port + index}"
+
+    def _spawn(self, index, role):
+        env = dict(os.environ)
+        env.update({
+            "PORT": str(self.base_port + index),
+            "CODENET_ADMIN_TOKEN": ADMIN_TOKEN,
+            "CODENET_REPLICATION_ROLE": role,
+            "CODENET_REPLICATION_TOKEN": REPLICATION_TOKEN,
+            "CODENET_REPLICATION_BIND": f"127.0.0.1:{self.replication_port}",
+            "CODENET_REPLICATION_LEADER": f"127.0.0.1:{self.replication_port}",
+            "CODENET_LEADER_URL": self.url(0),
+            "CODENET_DATA_DIR": os.path.join(self.data_dir, f"node{index}"),
+            "CODENET_NODE_ID": f"node{index}"
+        })
+        process = subprocess.Popen(
+            [sys.executable, SERVER_SCRIPT],
+            cwd=ROOT_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.processes.append(process)
+
+    def start(self, timeout=20):
+        os.makedirs(os.path.join(ROOT_DIR, "logs"), exist_ok=True)
+        self._spawn(0, "leader")
+        for index in range(1, self.follower_count + 1):
+            self._spawn(index, "follower")
+
+        deadline = time.time() + timeout
+        for index in range(self.follower_count + 1):
+            while True:
+                if self.processes[index].poll() is not None:
+                    raise RuntimeError(f"Nó {index} encerrou ao iniciar (porta em uso?)")
+                try:
+                    requests.get(f"{self.url(index)}/api/health", timeout=1)
+                    break
+                except requests.RequestException:
+                    if time.time() > deadline:
+                        raise RuntimeError(f"Nó {index} não respondeu")
+                    time.sleep(0.2)
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait(timeout=10)
+
+
+def check(name, condition, detail=""):
+    icon = "✅" if condition else "❌"
+    print(f"{icon} {name} {detail}")
+    return condition
+
+
+def main():
+    """Função principal"""
+    cluster = ReplicationCluster()
+    print(f"🚀 Subindo cluster (dados em {cluster.data_dir})")
+    cluster.start()
+    results = []
+
+    try:
+        leader, follower1, follower2 = cluster.url(0), cluster.url(1), cluster.url(2)
+
+        # Escrita via follower é encaminhada ao leader
+        response = requests.post(f"{follower1}/api/register", json={
+            "app_name": "Replicated App", "app_version": "1.0", "platform": "Linux"
+        })
+        results.append(check("Registro via follower", response.status_code == 201))
+        api_key = response.json()["data"]["api_key"]
+
+        response = requests.post(f"{follower2}/api/connect", json={"api_key": api_key})
+        results.append(check("Conexão via follower", response.status_code == 200))
+        token = response.json()["data"]["session_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        # Leituras atendidas localmente por cada nó
+        time.sleep(0.5)
+        for name, url in (("leader", leader), ("follower 1", follower1), ("follower 2", follower2)):
+            response = requests.get(f"{url}/api/status", headers=headers)
+            results.append(check(f"Sessão válida no {name}", response.status_code == 200))
+
+        response = requests.post(f"{follower1}/api/disconnect", headers=headers)
+        results.append(check("Desconexão via follower", response.status_code == 200))
+
+        response = requests.get(f"{follower2}/api/status", headers=headers)
+        results.append(check("Sessão removida no follower 2", response.status_code == 401))
+
+        # Atraso de replicação
+        admin = {"X-Admin-Token": ADMIN_TOKEN}
+        time.sleep(1.5)
+        status = requests.get(f"{leader}/api/admin/replication", headers=admin).json()["data"]
+        print(f"\n📊 Leader: head={status['head']} followers={len(status['followers'])}")
+        for follower in status["followers"]:
+            print(f"   {follower['node']}: acked={follower['acked_seq']} lag={follower['lag_entries']}")
+
+        for url in (follower1, follower2):
+            status = requests.get(f"{url}/api/admin/replication", headers=admin).json()["data"]
+            print(f"📊 Follower: applied={status['applied_seq']} lag={status['lag_entries']} "
+                  f"delay={status['last_entry_delay_seconds']}s")
+            results.append(check("Follower em dia", status["lag_entries"] == 0))
+    finally:
+        cluster.stop()
+
+    passed = sum(results)
+    print(f"\n📈 {passed}/{len(results)} verificações passaram")
+    sys.exit(0 if passed == len(results) else 1)
+
+
+if __name__ == "__main__":
+    main()